@@ -0,0 +1,261 @@
+"""Maintenance commands for the Flux backend.
+
+Usage:
+    python manage.py ensure-indexes
+    python manage.py prune-indexes
+    python manage.py check-plans
+    python manage.py reconcile-unread-counters
+    python manage.py migrate-profile-photos
+    python manage.py dedupe-uploads
+    python manage.py backfill-image-variants
+    python manage.py rebuild-report-stats
+    python manage.py migrate-dates
+    python manage.py backfill-report-divisions
+    python manage.py backfill-shift-change-divisions
+    python manage.py migrate-progress-updates
+    python manage.py migrate-comments
+"""
+import asyncio
+import sys
+
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+from server import (
+    COMMENT_SORT,
+    PROGRESS_UPDATE_SORT,
+    REPORT_SORT,
+    backfill_progress_image_variants,
+    backfill_report_divisions,
+    backfill_shift_change_divisions,
+    client,
+    db,
+    dedupe_uploads,
+    ensure_indexes,
+    migrate_comments,
+    migrate_date_fields,
+    migrate_profile_photos,
+    migrate_progress_updates,
+    rebuild_report_stats,
+    reconcile_unread_counters,
+    undeclared_indexes,
+)
+
+DAY_START = datetime(2024, 1, 1)
+DAY_END = datetime(2024, 1, 1, 23, 59, 59)
+
+# Query shapes issued by the API endpoints: (endpoint, collection, filter, sort).
+# check-plans runs explain() on each one and fails if any plan is a collection scan.
+QUERY_SHAPES = [
+    ("get_current_user", "users", {"id": "x"}, None),
+    ("login / register", "users", {"email": "x"}, None),
+    ("approver routing refresh", "users", {"account_status": "approved", "role": {"$in": ["SPV", "Manager", "VP"]}}, None),
+    ("get_pending_accounts", "users", {"account_status": "pending", "division": {"$in": ["x"]}, "role": {"$ne": "Manager"}}, None),
+    ("get_users", "users", {"account_status": "approved"}, None),
+    ("get_users_by_division", "users", {"division": "x", "account_status": "approved"}, None),
+    ("get_site", "sites", {"id": "x"}, None),
+    ("get_category", "activity_categories", {"id": "x"}, None),
+    ("create_activity_category", "activity_categories", {"name": "x"}, None),
+    ("get_schedule", "schedules", {"id": "x"}, None),
+    ("get_todays_schedules", "schedules", {"user_id": "x", "start_date": {"$gte": DAY_START, "$lte": DAY_END}}, None),
+    ("dashboard schedules today", "schedules", {"user_id": "x", "start_date": {"$lte": DAY_END}, "end_date": {"$gte": DAY_START}}, None),
+    ("get_schedules (window)", "schedules", {"start_date": {"$gte": DAY_START, "$lte": DAY_END}}, [("start_date", ASCENDING), ("id", ASCENDING)]),
+    ("get_schedules (division)", "schedules", {"division": "x", "start_date": {"$gte": DAY_START, "$lte": DAY_END}}, [("start_date", ASCENDING), ("id", ASCENDING)]),
+    ("get_schedules (user)", "schedules", {"user_id": "x", "start_date": {"$gte": DAY_START, "$lte": DAY_END}}, [("start_date", ASCENDING), ("id", ASCENDING)]),
+    ("get_schedules (site)", "schedules", {"site_id": "x"}, [("start_date", ASCENDING), ("id", ASCENDING)]),
+    ("get_schedules (category)", "schedules", {"category_id": "x"}, [("start_date", ASCENDING), ("id", ASCENDING)]),
+    ("get_activity", "activities", {"id": "x"}, None),
+    ("collect_schedule_activity", "activities", {"schedule_id": {"$in": ["x"]}}, [("schedule_id", ASCENDING), ("created_at", ASCENDING)]),
+    ("get_schedule_activity", "activities", {"schedule_id": "x"}, [("created_at", DESCENDING)]),
+    ("get_activities (Staff)", "activities", {"user_id": "x"}, [("created_at", DESCENDING)]),
+    ("get_activities (Manager)", "activities", {"division": "x"}, [("created_at", DESCENDING)]),
+    ("get_activities (VP)", "activities", {}, [("created_at", DESCENDING)]),
+    ("get_schedule_progress_updates", "progress_updates", {"schedule_id": "x"}, PROGRESS_UPDATE_SORT),
+    ("get_activity_progress_updates", "progress_updates", {"activity_id": "x"}, PROGRESS_UPDATE_SORT),
+    ("collect_schedule_activity updates", "progress_updates", {"schedule_id": {"$in": ["x"]}}, [("schedule_id", ASCENDING)] + PROGRESS_UPDATE_SORT),
+    ("image variant update", "progress_updates", {"image_url": "x"}, None),
+    ("get_shift_change_request", "shift_change_requests", {"id": "x"}, None),
+    ("get_shift_change_requests (Manager)", "shift_change_requests", {"status": "pending", "division": "x"}, [("created_at", DESCENDING)]),
+    ("get_shift_change_requests (VP)", "shift_change_requests", {"status": "pending"}, [("created_at", DESCENDING)]),
+    ("get_shift_change_requests (Staff)", "shift_change_requests", {"requested_by": "x"}, None),
+    ("update_schedule request sync", "shift_change_requests", {"schedule_id": "x"}, None),
+    ("backfill_shift_change_divisions", "shift_change_requests", {"division": {"$exists": False}}, None),
+    ("get_report", "reports", {"id": "x"}, None),
+    ("get_reports", "reports", {}, REPORT_SORT),
+    ("get_reports (site)", "reports", {"site_id": "x"}, REPORT_SORT),
+    ("get_reports (status)", "reports", {"status": "x"}, REPORT_SORT),
+    ("get_reports (category)", "reports", {"category_id": "x"}, REPORT_SORT),
+    ("get_reports (submitter)", "reports", {"submitted_by": "x"}, REPORT_SORT),
+    ("get_reports (date range)", "reports", {"created_at": {"$gte": DAY_START, "$lte": DAY_END}}, REPORT_SORT),
+    ("get_reports (division group)", "reports", {"submitter_division_group": "x"}, REPORT_SORT),
+    ("get_reports (division group, site)", "reports", {"submitter_division_group": "x", "site_id": "x"}, REPORT_SORT),
+    ("get_reports (division)", "reports", {"submitter_division": "x"}, None),
+    ("sync_report_divisions", "reports", {"submitted_by": "x", "$or": [{"submitter_division": {"$ne": "x"}}, {"submitter_division_group": {"$ne": "x"}}]}, None),
+    ("dashboard pending approvals", "reports", {"current_approver": "x"}, None),
+    ("report statistics", "report_stats", {"year": 2024, "dimension": "site", "month": 1, "category_id": "x"}, None),
+    ("report statistics (year to date)", "report_stats", {"year": 2024, "dimension": "site"}, None),
+    ("get_report_comments", "comments", {"parent_type": "report", "parent_id": "x"}, COMMENT_SORT),
+    ("get_ticket_comments", "comments", {"parent_type": "ticket", "parent_id": "x"}, COMMENT_SORT),
+    ("get_ticket", "tickets", {"id": "x"}, None),
+    ("get_tickets (site)", "tickets", {"site_id": "x"}, None),
+    ("dashboard open tickets", "tickets", {"status": {"$ne": "Closed"}, "assigned_to_division": "x"}, None),
+    ("delete_report ticket unlink", "tickets", {"linked_report_id": "x"}, None),
+    ("get_notifications", "notifications", {"user_id": "x"}, [("created_at", DESCENDING)]),
+    ("unread counter seeding", "notifications", {"user_id": "x", "read": False}, None),
+    ("serve_upload alias", "file_aliases", {"path": "x"}, None),
+    ("store_blob", "file_blobs", {"sha256": "x"}, None),
+    ("mark_notification_read", "notifications", {"id": "x", "user_id": "x", "read": False}, None),
+    ("get_unread_count", "notification_counters", {"user_id": "x"}, None),
+]
+
+
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+async def check_plans():
+    await ensure_indexes()
+    failures = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if _has_collscan(winning_plan):
+            failures.append(name)
+            print(f"COLLSCAN  {collection:<24} {name}")
+        else:
+            print(f"ok        {collection:<24} {name}")
+
+    if failures:
+        print(f"\n{len(failures)} query shape(s) fall back to a collection scan")
+        return 1
+    print("\nAll query shapes are index-backed")
+    return 0
+
+
+async def run_ensure_indexes():
+    await ensure_indexes()
+    print("Indexes ensured")
+    return 0
+
+
+async def prune_indexes():
+    await ensure_indexes()
+    dropped = 0
+    for collection_name, names in (await undeclared_indexes()).items():
+        for name in names:
+            await db[collection_name].drop_index(name)
+            print(f"Dropped {collection_name}.{name}")
+            dropped += 1
+    print(f"Dropped {dropped} undeclared index(es)")
+    return 0
+
+
+async def run_reconcile_unread_counters():
+    repaired = await reconcile_unread_counters()
+    print(f"Repaired {repaired} unread notification counter(s)")
+    return 0
+
+
+async def run_migrate_profile_photos():
+    migrated = await migrate_profile_photos()
+    print(f"Migrated {migrated} profile photo(s)")
+    return 0
+
+
+async def run_dedupe_uploads():
+    await ensure_indexes()
+    # References are rewritten in the progress_updates collection, not the legacy arrays
+    await migrate_progress_updates()
+    summary = await dedupe_uploads()
+    print(f"Moved {summary['files']} file(s) into the blob store, "
+          f"{summary['duplicates']} duplicate(s), {summary['bytes_saved']} bytes saved")
+    return 0
+
+
+async def run_backfill_image_variants():
+    await migrate_progress_updates()
+    processed = await backfill_progress_image_variants()
+    print(f"Generated variants for {processed} progress photo(s)")
+    return 0
+
+
+async def run_rebuild_report_stats():
+    await ensure_indexes()
+    repaired = await rebuild_report_stats()
+    print(f"Repaired {repaired} report statistics rollup(s)")
+    return 0
+
+
+async def run_migrate_dates():
+    summary = await migrate_date_fields()
+    print(f"Converted dates in {summary['documents']} document(s), "
+          f"{summary['skipped']} skipped with unparseable values")
+    return 1 if summary["skipped"] else 0
+
+
+async def run_backfill_report_divisions():
+    updated = await backfill_report_divisions()
+    print(f"Stamped submitter division on {updated} report(s)")
+    return 0
+
+
+async def run_backfill_shift_change_divisions():
+    updated = await backfill_shift_change_divisions()
+    print(f"Stamped division on {updated} shift change request(s)")
+    return 0
+
+
+async def run_migrate_progress_updates():
+    await ensure_indexes()
+    migrated = await migrate_progress_updates()
+    print(f"Moved progress updates out of {migrated} activity record(s)")
+    return 0
+
+
+async def run_migrate_comments():
+    await ensure_indexes()
+    migrated = await migrate_comments()
+    print(f"Moved comments out of {migrated} report(s) and ticket(s)")
+    return 0
+
+
+COMMANDS = {
+    "ensure-indexes": run_ensure_indexes,
+    "prune-indexes": prune_indexes,
+    "check-plans": check_plans,
+    "reconcile-unread-counters": run_reconcile_unread_counters,
+    "migrate-profile-photos": run_migrate_profile_photos,
+    "dedupe-uploads": run_dedupe_uploads,
+    "backfill-image-variants": run_backfill_image_variants,
+    "rebuild-report-stats": run_rebuild_report_stats,
+    "migrate-dates": run_migrate_dates,
+    "backfill-report-divisions": run_backfill_report_divisions,
+    "backfill-shift-change-divisions": run_backfill_shift_change_divisions,
+    "migrate-progress-updates": run_migrate_progress_updates,
+    "migrate-comments": run_migrate_comments,
+}
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+    try:
+        exit_code = asyncio.run(COMMANDS[sys.argv[1]]())
+    finally:
+        client.close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
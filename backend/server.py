@@ -1,28 +1,45 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+from bson import json_util
 import os
 import shutil
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 import uuid
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 import jwt
+import hashlib
+import mimetypes
 from passlib.context import CryptContext
+from PIL import Image, ImageOps, UnidentifiedImageError
 import base64
+import json
 import csv
 import io
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from itertools import islice
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
@@ -32,12 +49,55 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '64'))
+
+BULK_UPLOAD_CHUNK_SIZE = 500
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_ETAG_CACHE_SIZE = 4096
+
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+IMAGE_QUEUE_MAX_SIZE = int(os.environ.get('IMAGE_QUEUE_MAX_SIZE', '1000'))
+# Content-addressed names never change content, so caches may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=86400"
+# Maximum accepted size per upload type, in bytes
+UPLOAD_LIMITS = {
+    "report": int(os.environ.get('UPLOAD_MAX_REPORT_BYTES', str(50 * 1024 * 1024))),
+    "progress": int(os.environ.get('UPLOAD_MAX_PROGRESS_BYTES', str(20 * 1024 * 1024))),
+    "profile": int(os.environ.get('UPLOAD_MAX_PROFILE_BYTES', str(10 * 1024 * 1024))),
+}
+
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '100'))
+NOTIFICATION_FLUSH_INTERVAL_SECONDS = float(os.environ.get('NOTIFICATION_FLUSH_INTERVAL_SECONDS', '0.5'))
+NOTIFICATION_QUEUE_MAX_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_MAX_SIZE', '10000'))
+# "sync" writes notifications inline (used by tests); "async" batches them in the background
+NOTIFICATION_QUEUE_MODE = os.environ.get('NOTIFICATION_QUEUE_MODE', 'async')
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 20
+UNREAD_COUNTER_RECONCILE_SECONDS = float(os.environ.get('UNREAD_COUNTER_RECONCILE_SECONDS', '3600'))
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+PROGRESS_UPDATE_PAGE_SIZE = 50
+COMMENT_PAGE_SIZE = 50
+
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '1024'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+
+# Other workers' account changes reach this worker's routing table within the TTL
+APPROVER_ROUTING_TTL_SECONDS = float(os.environ.get('APPROVER_ROUTING_TTL_SECONDS', '300'))
+# Writes bump the version on the worker that handled them; other workers reload within the TTL
+REFERENCE_CACHE_TTL_SECONDS = float(os.environ.get('REFERENCE_CACHE_TTL_SECONDS', '60'))
+
 app = FastAPI()
 
-# Mount uploads directory for static access
+# Uploads directory, served by the /uploads route below
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(mode=0o755, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Content-addressed storage: blobs/<first two hex chars>/<sha256><ext>
+BLOB_DIR = UPLOAD_DIR / "blobs"
 
 api_router = APIRouter(prefix="/api")
 
@@ -52,7 +112,8 @@ class User(BaseModel):
     role: str
     division: Optional[str] = None
     account_status: str = "pending"  # NEW: pending, approved, rejected
-    profile_photo: Optional[str] = None  # NEW: Base64 encoded photo
+    profile_photo: Optional[str] = None  # URL of the profile photo (legacy: base64)
+    profile_photo_thumb: Optional[str] = None  # URL of the small avatar variant
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class UserCreate(BaseModel):
@@ -74,6 +135,7 @@ class UserResponse(BaseModel):
     division: Optional[str] = None
     account_status: Optional[str] = None
     profile_photo: Optional[str] = None
+    profile_photo_thumb: Optional[str] = None
 
 class UserProfileUpdate(BaseModel):  # NEW
     username: Optional[str] = None
@@ -178,7 +240,7 @@ class Activity(BaseModel):
     reason: Optional[str] = None  # Required for cancel
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    progress_updates: List[dict] = []  # NEW: Array of timestamped progress updates
+    progress_update_count: int = 0  # Updates live in the progress_updates collection
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -196,12 +258,27 @@ class ActivityProgressUpdate(BaseModel):
     activity_id: str
     update_text: str  # The progress update/comment
 
+class ProgressUpdate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    activity_id: str
+    schedule_id: str
+    user_id: Optional[str] = None
+    user_name: str
+    update_text: str
+    image_url: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 
 # NEW: Shift Change Request
 class ShiftChangeRequest(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     schedule_id: str
+    division: Optional[str] = None  # The schedule's division, for manager listings
+    user_id: Optional[str] = None  # The schedule's assignee
     requested_by: str
     requested_by_name: str
     reason: str
@@ -229,6 +306,8 @@ class CommentCreate(BaseModel):
 
 class Comment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    parent_type: str  # report or ticket
+    parent_id: str
     user_id: str
     user_name: str
     text: str
@@ -251,9 +330,12 @@ class Report(BaseModel):
     ticket_id: Optional[str] = None
     site_id: Optional[str] = None  # NEW
     site_name: Optional[str] = None  # NEW
+    submitter_division: Optional[str] = None
+    submitter_division_group: Optional[str] = None
     version: int = 1
     rejection_comment: Optional[str] = None
-    comments: List[Comment] = []
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -285,7 +367,8 @@ class Ticket(BaseModel):
     site_name: Optional[str] = None  # NEW
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    comments: List[dict] = []
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
 
 class TicketCreate(BaseModel):
     title: str
@@ -321,13 +404,478 @@ class Notification(BaseModel):
     read: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# ============ USER CACHE ============
+
+# Slim projection kept in the cache: no password hash
+USER_CACHE_PROJECTION = {"_id": 0, "password_hash": 0}
+
+class UserCache:
+    """Bounded LRU cache of authenticated users with a per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(user)
+
+    def set(self, user_id: str, user: dict):
+        self._entries[user_id] = (dict(user), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+# ============ APPROVER ROUTING ============
+
+# Sub-divisions are approved and managed by their parent division
+PARENT_DIVISION = {"Apps": "TS", "Fiberzone": "Infra"}
+APPROVER_ROLES = ["SPV", "Manager", "VP"]
+
+def approval_division(division: Optional[str]) -> Optional[str]:
+    """The division whose SPV and Manager approve for members of division"""
+    return PARENT_DIVISION.get(division, division)
+
+def managed_divisions(division: Optional[str]) -> list:
+    """A manager's own division followed by its sub-divisions"""
+    return [division] + [child for child, parent in PARENT_DIVISION.items() if parent == division]
+
+def can_manage_division(manager_division: Optional[str], target_division: Optional[str]) -> bool:
+    return target_division in managed_divisions(manager_division)
+
+class ApproverRouting:
+    """In-memory (role, division) -> approver table over approved SPVs, Managers and the VP"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.lookups = 0
+        self.refreshes = 0
+        self._table = {}
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        table = {}
+        cursor = db.users.find(
+            {"account_status": "approved", "role": {"$in": APPROVER_ROLES}},
+            {"_id": 0, "id": 1, "username": 1, "role": 1, "division": 1}
+        ).sort([("created_at", ASCENDING), ("id", ASCENDING)])
+        async for user in cursor:
+            # The VP approves for every division; otherwise the longest-standing account wins
+            division = None if user["role"] == "VP" else user.get("division")
+            table.setdefault((user["role"], division), user)
+        self._table = table
+        self._expires_at = time.monotonic() + self.ttl_seconds
+        self.refreshes += 1
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    async def get(self, role: str, division: Optional[str] = None) -> Optional[dict]:
+        """The user holding role in exactly division (any division for the VP)"""
+        if self._expires_at < time.monotonic():
+            async with self._lock:
+                if self._expires_at < time.monotonic():
+                    await self.refresh()
+        self.lookups += 1
+        return self._table.get((role, None if role == "VP" else division))
+
+    async def get_id(self, role: str, division: Optional[str] = None) -> Optional[str]:
+        approver = await self.get(role, division)
+        return approver["id"] if approver else None
+
+    async def first_approver(self, division: Optional[str], roles: list) -> tuple:
+        """The first of roles with a holder for division's approval chain, as (role, user id)"""
+        for role in roles:
+            approver_id = await self.get_id(role, approval_division(division))
+            if approver_id:
+                return role, approver_id
+        return None, None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._table),
+            "lookups": self.lookups,
+            "refreshes": self.refreshes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+approver_routing = ApproverRouting(APPROVER_ROUTING_TTL_SECONDS)
+
+# ============ REFERENCE DATA CACHE ============
+
+async def _load_sites() -> list:
+    return await db.sites.find({}, {"_id": 0}).to_list(1000)
+
+async def _load_activity_categories() -> list:
+    return await db.activity_categories.find({}, {"_id": 0}).to_list(100)
+
+async def _load_approved_users() -> list:
+    users = await db.users.find({"account_status": "approved"}, {"_id": 0, "password_hash": 0}).to_list(1000)
+    return [UserResponse(**user).model_dump() for user in users]
+
+REFERENCE_DATA_LOADERS = {
+    "sites": _load_sites,
+    "activity_categories": _load_activity_categories,
+    "users": _load_approved_users,
+}
+
+def _reference_view(data: list) -> dict:
+    body = json.dumps(jsonable_encoder(data)).encode('utf-8')
+    # Content digest, so every worker hands out the same ETag for the same data
+    return {"data": data, "body": body, "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"'}
+
+class ReferenceDataCache:
+    """Versioned in-memory copies of rarely changing lists, pre-serialized with their ETags"""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._versions = {name: 0 for name in REFERENCE_DATA_LOADERS}
+        self._entries = {}
+        self._locks = {name: asyncio.Lock() for name in REFERENCE_DATA_LOADERS}
+
+    def _fresh(self, name: str) -> Optional[dict]:
+        entry = self._entries.get(name)
+        if entry and entry["version"] == self._versions[name] and entry["expires_at"] >= time.monotonic():
+            return entry
+        return None
+
+    async def get(self, name: str) -> dict:
+        entry = self._fresh(name)
+        if entry:
+            self.hits += 1
+            return entry
+        async with self._locks[name]:
+            entry = self._fresh(name)
+            if entry:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            # A write landing mid-load bumps the version past this entry's, so it reloads next time
+            version = self._versions[name]
+            entry = _reference_view(await REFERENCE_DATA_LOADERS[name]())
+            entry.update({"version": version, "expires_at": time.monotonic() + self.ttl_seconds, "divisions": {}})
+            self._entries[name] = entry
+            return entry
+
+    async def get_users_by_division(self, division: str) -> dict:
+        users = await self.get("users")
+        view = users["divisions"].get(division)
+        if view is None:
+            view = _reference_view([u for u in users["data"] if u.get("division") == division])
+            if view["data"]:
+                # Only real divisions are kept, so arbitrary path values cannot grow the entry
+                users["divisions"][division] = view
+        return view
+
+    def invalidate(self, name: str):
+        self._versions[name] += 1
+
+    async def warm(self):
+        for name in REFERENCE_DATA_LOADERS:
+            await self.get(name)
+
+    def response(self, request: Request, view: dict) -> Response:
+        """The cached body, or an empty 304 when the client already holds this version"""
+        headers = {"ETag": view["etag"], "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if view["etag"] in client_etags or "*" in client_etags:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=view["body"], media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "versions": dict(self._versions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+reference_cache = ReferenceDataCache(REFERENCE_CACHE_TTL_SECONDS)
+
+# ============ PASSWORD HASHING ============
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so hashing never blocks the event loop"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def _run(self, func, *args):
+        # Shed load instead of queueing without bound during a login burst
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, please try again")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+# ============ NOTIFICATION QUEUE ============
+
+class NotificationQueue:
+    """Write-behind buffer that coalesces notification inserts into insert_many batches"""
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int, flush_interval: float, max_size: int, synchronous: bool):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self.written = 0
+        self.failed = 0
+        self._queue = asyncio.Queue(maxsize=max_size)
+        self._task = None
+
+    def start(self):
+        if not self.synchronous and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Flush whatever is still buffered before the process exits
+        if self._task is not None:
+            await self._queue.put(self._STOP)
+            await self._task
+            self._task = None
+
+    async def put_many(self, docs: list):
+        if not docs:
+            return
+        if self._task is None:
+            await self._write(docs)
+            return
+        for doc in docs:
+            # Blocks when the buffer is full, pushing back on producers
+            await self._queue.put(doc)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, docs: list):
+        try:
+            await db.notifications.insert_many(docs, ordered=False)
+        except PyMongoError as e:
+            self.failed += len(docs)
+            logger.error(f"Failed to write {len(docs)} notifications: {e}")
+            return
+        self.written += len(docs)
+        try:
+            await increment_unread_counters(docs)
+        except PyMongoError as e:
+            # Counters drift until the next reconciliation
+            logger.error(f"Failed to update unread counters: {e}")
+        # Pushed only once stored, so a client marking it read right away finds it
+        notification_hub.publish(docs)
+
+    def stats(self) -> dict:
+        return {
+            "mode": "sync" if self.synchronous else "async",
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed
+        }
+
+notification_queue = NotificationQueue(
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_FLUSH_INTERVAL_SECONDS,
+    NOTIFICATION_QUEUE_MAX_SIZE,
+    synchronous=NOTIFICATION_QUEUE_MODE == "sync"
+)
+
+# ============ UNREAD NOTIFICATION COUNTERS ============
+
+# notification_counters holds one {user_id, unread, seeded} document per user so the
+# unread badge is a point read instead of a count over the user's history. Increments
+# always upsert; a counter not yet seeded from the user's history is seeded once, on
+# its first read. Counter and notifications are separate writes, so a counter can
+# drift by the few notifications in flight during a seed, until the next reconcile.
+
+async def increment_unread_counters(docs: list):
+    per_user = {}
+    for doc in docs:
+        if not doc.get("read"):
+            per_user[doc["user_id"]] = per_user.get(doc["user_id"], 0) + 1
+    if per_user:
+        await db.notification_counters.bulk_write(
+            [UpdateOne({"user_id": user_id}, {"$inc": {"unread": count}}, upsert=True) for user_id, count in per_user.items()],
+            ordered=False
+        )
+
+async def reconcile_unread_counters() -> int:
+    """Recompute every counter from the notifications collection; returns the number repaired"""
+    actual = {}
+    async for entry in db.notifications.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}}
+    ]):
+        actual[entry["_id"]] = entry["unread"]
+    
+    operations = []
+    async for counter in db.notification_counters.find({}, {"_id": 0}):
+        expected = actual.pop(counter["user_id"], 0)
+        if counter.get("unread") != expected or not counter.get("seeded"):
+            # Guarded on the value read: a counter that moved meanwhile is left for the next pass
+            operations.append(UpdateOne(
+                {"user_id": counter["user_id"], "unread": counter.get("unread")},
+                {"$set": {"unread": expected, "seeded": True}}
+            ))
+    for user_id, expected in actual.items():
+        # Only if still absent; one created by an increment meanwhile is seeded on read
+        operations.append(UpdateOne({"user_id": user_id}, {"$setOnInsert": {"unread": expected, "seeded": True}}, upsert=True))
+    
+    if operations:
+        await db.notification_counters.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def reconcile_unread_counters_periodically():
+    while True:
+        await asyncio.sleep(UNREAD_COUNTER_RECONCILE_SECONDS)
+        try:
+            repaired = await reconcile_unread_counters()
+            if repaired:
+                logger.info(f"Repaired {repaired} unread notification counters")
+        except PyMongoError as e:
+            logger.error(f"Unread counter reconciliation failed: {e}")
+
+# ============ NOTIFICATION HUB ============
+
+class NotificationHub:
+    """In-process pub/sub that pushes new notifications to each user's open streams"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, docs: list):
+        for doc in docs:
+            queues = self._subscribers.get(doc["user_id"])
+            if not queues:
+                continue
+            payload = json.dumps(jsonable_encoder({k: v for k, v in doc.items() if k != "_id"}))
+            for queue in list(queues):
+                try:
+                    queue.put_nowait(payload)
+                    self.published += 1
+                except asyncio.QueueFull:
+                    # Slow consumer: disconnect it, the client reconnects and resyncs over REST
+                    self.unsubscribe(doc["user_id"], queue)
+                    self.dropped += 1
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+notification_hub = NotificationHub(NOTIFICATION_STREAM_QUEUE_SIZE)
+
 # ============ HELPER FUNCTIONS ============
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -336,24 +884,29 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def authenticate_token(token: str) -> dict:
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = user_cache.get(user_id)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
+            user = await db.users.find_one({"id": user_id}, USER_CACHE_PROJECTION)
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache.set(user_id, user)
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-async def create_notification(user_id: str, title: str, message: str, notification_type: str, related_id: Optional[str] = None):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+def build_notification(user_id: str, title: str, message: str, notification_type: str, related_id: Optional[str] = None) -> dict:
     notification = Notification(
         user_id=user_id,
         title=title,
@@ -362,8 +915,630 @@ async def create_notification(user_id: str, title: str, message: str, notificati
         related_id=related_id
     )
     doc = notification.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.notifications.insert_one(doc)
+    return doc
+
+async def create_notifications(docs: list):
+    # Open streams get each notification after the queue has written it
+    await notification_queue.put_many(docs)
+
+async def create_notification(user_id: str, title: str, message: str, notification_type: str, related_id: Optional[str] = None):
+    await create_notifications([build_notification(user_id, title, message, notification_type, related_id)])
+
+# ============ UPLOAD STORAGE ============
+
+def _upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+def _write_chunk(f, digest, chunk: bytes):
+    digest.update(chunk)
+    f.write(chunk)
+
+async def save_upload(upload: UploadFile, dest: Path, max_bytes: int) -> dict:
+    """Stream an upload to dest off the event loop and return its size and SHA-256.
+
+    Chunks go to a temporary file next to dest which is renamed into place only
+    once the whole upload has been written, so readers never see partial files.
+    """
+    await asyncio.to_thread(dest.parent.mkdir, parents=True, exist_ok=True)
+    tmp_path = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise _upload_too_large(max_bytes)
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, tmp_path, dest)
+    except BaseException:
+        f.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    return {"size": size, "sha256": digest.hexdigest()}
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    """Read a small upload into memory, enforcing max_bytes"""
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise _upload_too_large(max_bytes)
+    return data
+
+# ============ BLOB STORE ============
+
+# Uploaded files are stored once per distinct content. file_blobs tracks each
+# blob's path and how many reports/progress updates reference it; file_aliases
+# maps pre-dedupe upload paths to the blob that replaced them.
+
+def _blob_extension(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+def _place_blob(src: Path, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # Same content either way, so replacing an existing blob is harmless
+    os.replace(src, dest)
+
+async def _register_blob(sha256: str, size: int, extension: str, references: int) -> dict:
+    return await db.file_blobs.find_one_and_update(
+        {"sha256": sha256},
+        {
+            "$inc": {"refcount": references},
+            "$setOnInsert": {
+                "path": f"blobs/{sha256[:2]}/{sha256}{extension}",
+                "size": size,
+                "created_at": datetime.now(timezone.utc)
+            }
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+def _move_aside(src: Path, dest: Path) -> bool:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dest)
+    except FileNotFoundError:
+        return False
+    return True
+
+async def store_blob(upload: UploadFile, max_bytes: int) -> dict:
+    """Store an upload in the blob store, taking one reference, and return its URL"""
+    tmp_path = BLOB_DIR / "tmp" / uuid.uuid4().hex
+    stored = await save_upload(upload, tmp_path, max_bytes)
+    blob = await _register_blob(stored["sha256"], stored["size"], _blob_extension(upload.filename), 1)
+    await asyncio.to_thread(_place_blob, tmp_path, UPLOAD_DIR / blob["path"])
+    return {"url": f"/uploads/{blob['path']}", "sha256": stored["sha256"], "size": stored["size"]}
+
+def _write_file(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+async def store_blob_bytes(data: bytes, extension: str) -> dict:
+    """Store generated content in the blob store, taking one reference, and return its URL"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    tmp_path = BLOB_DIR / "tmp" / uuid.uuid4().hex
+    await asyncio.to_thread(_write_file, tmp_path, data)
+    blob = await _register_blob(sha256, len(data), extension, 1)
+    await asyncio.to_thread(_place_blob, tmp_path, UPLOAD_DIR / blob["path"])
+    return {"url": f"/uploads/{blob['path']}", "sha256": sha256, "size": len(data)}
+
+async def upload_path_for_url(url: Optional[str]) -> Optional[Path]:
+    """Local file behind an /uploads URL, following aliases of deduplicated files"""
+    if not url or not url.startswith("/uploads/"):
+        return None
+    upload_root = UPLOAD_DIR.resolve()
+    relative_path = url[len("/uploads/"):]
+    path = (upload_root / relative_path).resolve()
+    if not path.is_relative_to(upload_root):
+        return None
+    if path.is_file():
+        return path
+    alias = await db.file_aliases.find_one({"path": relative_path}, {"_id": 0, "sha256": 1})
+    blob = await db.file_blobs.find_one({"sha256": alias["sha256"]}, {"_id": 0, "path": 1}) if alias else None
+    if blob and (UPLOAD_DIR / blob["path"]).is_file():
+        return (UPLOAD_DIR / blob["path"]).resolve()
+    return None
+
+async def resolve_blob_sha(url: Optional[str]) -> Optional[str]:
+    if not url or not url.startswith("/uploads/"):
+        return None
+    if url.startswith("/uploads/blobs/"):
+        return posixpath.basename(url).split(".")[0]
+    alias = await db.file_aliases.find_one({"path": url[len("/uploads/"):]}, {"_id": 0, "sha256": 1})
+    return alias["sha256"] if alias else None
+
+async def release_blob(url: Optional[str]):
+    """Drop one reference to the blob behind url, deleting it when unreferenced"""
+    sha256 = await resolve_blob_sha(url)
+    if not sha256:
+        return
+    blob = await db.file_blobs.find_one_and_update(
+        {"sha256": sha256},
+        {"$inc": {"refcount": -1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["refcount"] > 0:
+        return
+    # Guarded on the refcount: a concurrent upload may have taken a reference since
+    removed = await db.file_blobs.find_one_and_delete({"sha256": sha256, "refcount": {"$lte": 0}})
+    if not removed:
+        return
+    await db.file_aliases.delete_many({"sha256": sha256})
+    
+    # An upload of the same content registers the blob before placing its file, so
+    # move the file aside and only delete it if no new registration appeared meanwhile
+    blob_path = UPLOAD_DIR / removed["path"]
+    trash_path = BLOB_DIR / "tmp" / uuid.uuid4().hex
+    if not await asyncio.to_thread(_move_aside, blob_path, trash_path):
+        return
+    if await db.file_blobs.find_one({"sha256": sha256}, {"_id": 0, "sha256": 1}):
+        await asyncio.to_thread(_place_blob, trash_path, blob_path)
+    else:
+        await asyncio.to_thread(trash_path.unlink, missing_ok=True)
+
+def _hash_file(path: Path) -> tuple:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest(), path.stat().st_size
+
+def _list_legacy_uploads() -> list:
+    files = []
+    for folder in ("reports", "activities"):
+        root = UPLOAD_DIR / folder
+        if root.is_dir():
+            files.extend(path for path in root.rglob("*") if path.is_file())
+    return files
+
+def _copy_to_blob(path: Path, blob_path: Path):
+    # Copy, not move: the legacy file keeps serving until its references are rewritten
+    tmp_path = BLOB_DIR / "tmp" / uuid.uuid4().hex
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(path, tmp_path)
+    _place_blob(tmp_path, blob_path)
+
+async def dedupe_uploads() -> dict:
+    """Move legacy per-upload files into the blob store, rewriting references.
+
+    Resumable: the legacy file is removed only after its alias, references and
+    refcount are in place, so an interrupted file is simply processed again.
+    """
+    summary = {"files": 0, "duplicates": 0, "bytes_saved": 0}
+    for path in await asyncio.to_thread(_list_legacy_uploads):
+        sha256, size = await asyncio.to_thread(_hash_file, path)
+        legacy_path = path.relative_to(UPLOAD_DIR).as_posix()
+        legacy_url = f"/uploads/{legacy_path}"
+        
+        blob = await _register_blob(sha256, size, _blob_extension(path.name), 0)
+        blob_path = UPLOAD_DIR / blob["path"]
+        blob_url = f"/uploads/{blob['path']}"
+        if blob_path.exists():
+            summary["duplicates"] += 1
+            summary["bytes_saved"] += size
+        else:
+            await asyncio.to_thread(_copy_to_blob, path, blob_path)
+        await db.file_aliases.update_one({"path": legacy_path}, {"$set": {"sha256": sha256}}, upsert=True)
+        
+        # Count before rewriting: an interrupted run can only over-count (keeping the
+        # blob alive), never leave a reference that release_blob could under-run
+        references = (
+            await db.reports.count_documents({"file_url": legacy_url})
+            + await db.progress_updates.count_documents({"image_url": legacy_url})
+        )
+        if references:
+            await db.file_blobs.update_one({"sha256": sha256}, {"$inc": {"refcount": references}})
+        await db.reports.update_many({"file_url": legacy_url}, {"$set": {"file_url": blob_url}})
+        await db.progress_updates.update_many({"image_url": legacy_url}, {"$set": {"image_url": blob_url}})
+        
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+        summary["files"] += 1
+    return summary
+
+# ============ IMAGE HELPERS ============
+
+# Profile photo variants: user field -> longest edge in pixels
+PROFILE_PHOTO_VARIANTS = {"profile_photo": 256, "profile_photo_thumb": 64}
+
+def render_image_variant(data: bytes, max_px: int) -> bytes:
+    """Re-encode an image as a JPEG no larger than max_px, with EXIF metadata stripped"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_px, max_px))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+def save_profile_photo(user_id: str, data: bytes) -> dict:
+    """Write the sized variants of a profile photo to disk and return their URLs"""
+    photo_dir = UPLOAD_DIR / "profiles" / user_id
+    photo_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Content hash in the name so a new photo never reuses a cached URL
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    urls = {}
+    written = set()
+    for field, max_px in PROFILE_PHOTO_VARIANTS.items():
+        filename = f"{digest}_{max_px}.jpg"
+        (photo_dir / filename).write_bytes(render_image_variant(data, max_px))
+        urls[field] = f"/uploads/profiles/{user_id}/{filename}"
+        written.add(filename)
+    
+    # Remove the previous photo's files
+    for old_file in photo_dir.iterdir():
+        if old_file.name not in written:
+            old_file.unlink(missing_ok=True)
+    return urls
+
+# Progress photo variants: progress update field -> longest edge in pixels
+PROGRESS_PHOTO_VARIANTS = {"image_web_url": 1600, "image_thumb_url": 320}
+
+class ImageVariantWorker:
+    """Background pool that renders web and thumbnail variants of progress photos"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def submit(self, image_url: str):
+        try:
+            self._queue.put_nowait(image_url)
+        except asyncio.QueueFull:
+            # Left for the backfill; the original image is still served meanwhile
+            self.skipped += 1
+
+    async def _run(self):
+        while True:
+            image_url = await self._queue.get()
+            try:
+                await self.process(image_url)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to generate variants for {image_url}: {e}")
+
+    async def process(self, image_url: str) -> bool:
+        path = await upload_path_for_url(image_url)
+        if path is None:
+            return False
+        data = await asyncio.to_thread(path.read_bytes)
+        loop = asyncio.get_running_loop()
+        
+        variant_urls = {}
+        for field, max_px in PROGRESS_PHOTO_VARIANTS.items():
+            try:
+                variant = await loop.run_in_executor(self._executor, render_image_variant, data, max_px)
+            except (UnidentifiedImageError, OSError):
+                # Not an image (or unreadable); keep serving the original
+                return False
+            variant_urls[field] = (await store_blob_bytes(variant, ".jpg"))["url"]
+        
+        await db.progress_updates.update_many({"image_url": image_url}, {"$set": variant_urls})
+        self.processed += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped
+        }
+
+image_variant_worker = ImageVariantWorker(IMAGE_WORKERS, IMAGE_QUEUE_MAX_SIZE)
+
+async def backfill_progress_image_variants() -> int:
+    """Generate variants for progress photos uploaded before the worker existed"""
+    image_urls = await db.progress_updates.distinct("image_url", {
+        "image_url": {"$type": "string"},
+        "image_thumb_url": {"$exists": False}
+    })
+    
+    processed = 0
+    for image_url in image_urls:
+        try:
+            if await image_variant_worker.process(image_url):
+                processed += 1
+        except Exception as e:
+            # One bad upload (e.g. a decompression bomb) must not abort the rest
+            image_variant_worker.failed += 1
+            logger.error(f"Failed to generate variants for {image_url}: {e}")
+    return processed
+
+async def migrate_profile_photos() -> int:
+    """Move legacy base64 profile photos out of the users collection; returns the number migrated"""
+    migrated = 0
+    legacy_query = {"profile_photo": {"$type": "string", "$not": re.compile(r"^/")}}
+    async for user in db.users.find(legacy_query, {"_id": 0, "id": 1, "profile_photo": 1}):
+        try:
+            data = base64.b64decode(user["profile_photo"])
+            photo_urls = await asyncio.to_thread(save_profile_photo, user["id"], data)
+        except (ValueError, UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            logger.warning(f"Dropping unreadable profile photo for user {user['id']}: {e}")
+            photo_urls = {field: None for field in PROFILE_PHOTO_VARIANTS}
+        await db.users.update_one({"id": user["id"]}, {"$set": photo_urls})
+        user_cache.invalidate(user["id"])
+        migrated += 1
+    if migrated:
+        reference_cache.invalidate("users")
+    return migrated
+
+# ============ DATE STORAGE ============
+
+# Timestamps are stored as BSON dates so range filters and sorts compare instants.
+# The client is tz_aware: dates read back as UTC datetimes and serialize with an offset.
+# Schedule times are wall-clock readings entered without an offset; they are stored
+# at that reading as if it were UTC and handed back naive, the way they were entered.
+WALL_CLOCK_FIELDS = ("start_date", "end_date", "new_start_date", "new_end_date")
+
+# Every stored date, per collection; "array.field" names a date inside array elements
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "sites": ["created_at"],
+    "activity_categories": ["created_at"],
+    "schedules": ["start_date", "end_date", "created_at"],
+    "shift_change_requests": ["new_start_date", "new_end_date", "created_at", "updated_at"],
+    "activities": ["created_at", "updated_at"],
+    "progress_updates": ["timestamp"],
+    "reports": ["created_at", "updated_at", "last_comment_at"],
+    "tickets": ["created_at", "updated_at", "last_comment_at"],
+    "comments": ["created_at"],
+    "notifications": ["created_at"],
+    "file_blobs": ["created_at"],
+}
+DATE_MIGRATION_BATCH_SIZE = int(os.environ.get('DATE_MIGRATION_BATCH_SIZE', '500'))
+
+# True until the migration has found no ISO-string dates left; range filters
+# match both representations meanwhile
+string_dates_remaining = True
+
+def to_bson_datetime(value, wall_clock: bool = False) -> datetime:
+    """Parse an ISO string (or take a datetime) into the value stored in Mongo"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # pymongo stores naive datetimes as UTC
+        return value
+    return value.replace(tzinfo=None) if wall_clock else value.astimezone(timezone.utc)
+
+def stored_datetime(value) -> datetime:
+    """A stored date (or a not yet migrated ISO string) as an aware UTC datetime"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def wall_clock(doc: dict) -> dict:
+    """Strip the UTC offset from schedule times, on the way in and on the way out"""
+    for field in WALL_CLOCK_FIELDS:
+        if isinstance(doc.get(field), datetime):
+            doc[field] = doc[field].replace(tzinfo=None)
+    return doc
+
+def add_date_range(query: dict, field: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+    """Add an inclusive date range on field to query"""
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lte"] = end
+    if not string_dates_remaining:
+        query[field] = bounds
+        return query
+    legacy_bounds = {op: value.isoformat() for op, value in bounds.items()}
+    query.setdefault("$and", []).append({"$or": [{field: bounds}, {field: legacy_bounds}]})
+    return query
+
+def _date_migration_update(doc: dict, fields: list):
+    update = {}
+    array_filters = []
+    for field in fields:
+        if "." not in field:
+            value = doc.get(field)
+            if isinstance(value, str):
+                update[field] = to_bson_datetime(value, field in WALL_CLOCK_FIELDS) if value else None
+            continue
+        array, subfield = field.split(".", 1)
+        legacy_values = {item.get(subfield) for item in doc.get(array) or [] if isinstance(item, dict) and isinstance(item.get(subfield), str)}
+        for value in legacy_values:
+            name = f"d{len(array_filters)}"
+            update[f"{array}.$[{name}].{subfield}"] = to_bson_datetime(value) if value else None
+            array_filters.append({f"{name}.{subfield}": value})
+    if not update:
+        return None
+    # Matching on the old values leaves documents rewritten in the meantime alone
+    query = {"_id": doc["_id"], **{field: doc[field] for field in update if "." not in field}}
+    return UpdateOne(query, {"$set": update}, array_filters=array_filters or None)
+
+async def migrate_date_fields() -> dict:
+    """Rewrite ISO-string dates as BSON dates in batches; safe to rerun or interrupt"""
+    global string_dates_remaining
+    summary = {"documents": 0, "skipped": 0}
+    for collection_name, fields in DATE_FIELDS.items():
+        collection = db[collection_name]
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {field.split(".", 1)[0]: 1 for field in fields}
+        last_id = None
+        while True:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]} if last_id is not None else query
+            docs = await collection.find(batch_query, projection).sort("_id", ASCENDING).limit(DATE_MIGRATION_BATCH_SIZE).to_list(DATE_MIGRATION_BATCH_SIZE)
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            
+            operations = []
+            for doc in docs:
+                try:
+                    operation = _date_migration_update(doc, fields)
+                except ValueError as e:
+                    summary["skipped"] += 1
+                    logger.warning(f"Unparseable date in {collection_name} {doc['_id']}: {e}")
+                    continue
+                if operation:
+                    operations.append(operation)
+            if operations:
+                await collection.bulk_write(operations, ordered=False)
+                summary["documents"] += len(operations)
+    
+    if not summary["skipped"]:
+        string_dates_remaining = False
+    return summary
+
+# ============ PAGINATION HELPERS ============
+
+def encode_cursor(values: list) -> str:
+    # Extended JSON keeps datetimes typed across the round trip
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, expected_length: int) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Values go straight into the query, so anything but a scalar (e.g. {"$ne": null}) is rejected
+    if not all(isinstance(v, (str, int, float, datetime)) and not isinstance(v, bool) for v in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort: list, values: list) -> dict:
+    # Everything strictly after the cursor position in the given sort order
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: prev_value for (prev_field, _), prev_value in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+async def paginate(collection, query: dict, sort: list, cursor: Optional[str], limit: int, projection: Optional[dict] = None) -> dict:
+    """Keyset pagination; the last sort field must be unique (normally `id`)"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, len(sort)))]}
+    
+    items = await collection.find(query, projection or {"_id": 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([items[-1].get(field) for field, _ in sort])
+    
+    return {"items": items, "next_cursor": next_cursor}
+
+def parse_iso_param(value: Optional[str], name: str, wall_clock: bool = False) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return to_bson_datetime(value, wall_clock)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, expected an ISO date")
+
+# ============ REPORT STATISTICS ROLLUPS ============
+
+# report_stats holds one {year, month, dimension, category_id, key, count} document
+# per group, kept current as reports are created, edited and deleted, so the
+# statistics endpoints read O(groups) rows instead of re-aggregating reports.
+REPORT_STAT_DIMENSIONS = {"submitter": "submitted_by_name", "site": "site_name"}
+
+def report_period(created_at) -> tuple:
+    created_at = stored_datetime(created_at)
+    return created_at.year, created_at.month
+
+def report_stat_keys(report: dict) -> list:
+    year, month = report_period(report["created_at"])
+    keys = []
+    for dimension, field in REPORT_STAT_DIMENSIONS.items():
+        if report.get(field):
+            keys.append((year, month, dimension, report.get("category_id"), report[field]))
+    return keys
+
+async def apply_report_rollup(report: dict, delta: int):
+    operations = [
+        UpdateOne(
+            {"year": year, "month": month, "dimension": dimension, "category_id": category_id, "key": key},
+            {"$inc": {"count": delta}},
+            upsert=True
+        )
+        for year, month, dimension, category_id, key in report_stat_keys(report)
+    ]
+    if operations:
+        await db.report_stats.bulk_write(operations, ordered=False)
+
+async def move_report_rollup(before: dict, after: dict):
+    """Shift a report's counts when an edit changes its site or category"""
+    if report_stat_keys(before) != report_stat_keys(after):
+        await apply_report_rollup(before, -1)
+        await apply_report_rollup(after, 1)
+
+async def rebuild_report_stats() -> int:
+    """Recompute every rollup from the reports collection; returns the number repaired"""
+    actual = {}
+    projection = {"_id": 0, "created_at": 1, "category_id": 1, **{field: 1 for field in REPORT_STAT_DIMENSIONS.values()}}
+    async for report in db.reports.find({}, projection):
+        for group in report_stat_keys(report):
+            actual[group] = actual.get(group, 0) + 1
+    
+    operations = []
+    async for entry in db.report_stats.find({}, {"_id": 0}):
+        group = (entry["year"], entry["month"], entry["dimension"], entry.get("category_id"), entry["key"])
+        expected = actual.pop(group, 0)
+        if entry.get("count") != expected:
+            operations.append(UpdateOne(dict(zip(("year", "month", "dimension", "category_id", "key"), group)), {"$set": {"count": expected}}))
+    for group, expected in actual.items():
+        operations.append(UpdateOne(dict(zip(("year", "month", "dimension", "category_id", "key"), group)), {"$set": {"count": expected}}, upsert=True))
+    
+    if operations:
+        await db.report_stats.bulk_write(operations, ordered=False)
+    await db.report_stats.delete_many({"count": {"$lte": 0}})
+    return len(operations)
+
+async def seed_report_stats():
+    """Build the rollups once for deployments that predate them"""
+    if await db.report_stats.find_one({}, {"_id": 1}) is None:
+        seeded = await rebuild_report_stats()
+        if seeded:
+            logger.info(f"Seeded {seeded} report statistics rollups")
+
+async def read_report_stats(dimension: str, year: int, month: Optional[int], category_id: Optional[str]) -> list:
+    if month is not None and not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Invalid month or year")
+    query = {"year": year, "dimension": dimension, "count": {"$gt": 0}}
+    if month is not None:
+        query["month"] = month
+    if category_id and category_id != "all":
+        query["category_id"] = category_id
+    
+    totals = {}
+    async for entry in db.report_stats.find(query, {"_id": 0, "key": 1, "count": 1}):
+        totals[entry["key"]] = totals.get(entry["key"], 0) + entry["count"]
+    return [{"name": key, "value": count} for key, count in totals.items()]
 
 # ============ AUTH ENDPOINTS ============
 
@@ -389,31 +1564,27 @@ async def register(user_data: UserCreate):
     user = User(
         username=user_data.username,
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await get_password_hash(user_data.password),
         role=user_data.role,
         division=user_data.division,
         account_status=account_status
     )
     
     doc = user.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.users.insert_one(doc)
+    if account_status == "approved":
+        reference_cache.invalidate("users")
+        if user_data.role in APPROVER_ROLES:
+            approver_routing.invalidate()
     
     # NEW: Notify appropriate approver
     if user_data.role in ["Staff", "SPV"] and user_data.division:
 
 
-        # Determine target division for approval
-        target_division = user_data.division
-        if user_data.division == "Apps":
-            target_division = "TS"
-        elif user_data.division == "Fiberzone":
-            target_division = "Infra"
-            
-        manager = await db.users.find_one({"role": "Manager", "division": target_division}, {"_id": 0})
-        if manager:
+        manager_id = await approver_routing.get_id("Manager", approval_division(user_data.division))
+        if manager_id:
             await create_notification(
-                user_id=manager["id"],
+                user_id=manager_id,
                 title="New Account Approval Required",
                 message=f"{user_data.username} ({user_data.role} - {user_data.division}) has registered and needs approval",
                 notification_type="account_approval",
@@ -422,10 +1593,10 @@ async def register(user_data: UserCreate):
                 related_id=user.id
             )
     elif user_data.role == "Manager":
-        vp = await db.users.find_one({"role": "VP"}, {"_id": 0})
-        if vp:
+        vp_id = await approver_routing.get_id("VP")
+        if vp_id:
             await create_notification(
-                user_id=vp["id"],
+                user_id=vp_id,
                 title="New Manager Approval Required",
                 message=f"{user_data.username} (Manager) has registered and needs approval",
                 notification_type="account_approval",
@@ -445,7 +1616,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # NEW: Check account status
@@ -466,7 +1637,8 @@ async def login(credentials: UserLogin):
             role=user["role"],
             division=user.get("division"),
             account_status=user.get("account_status"),
-            profile_photo=user.get("profile_photo")
+            profile_photo=user.get("profile_photo"),
+            profile_photo_thumb=user.get("profile_photo_thumb")
         )
     )
 
@@ -479,7 +1651,8 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         role=current_user["role"],
         division=current_user.get("division"),
         account_status=current_user.get("account_status"),
-        profile_photo=current_user.get("profile_photo")
+        profile_photo=current_user.get("profile_photo"),
+        profile_photo_thumb=current_user.get("profile_photo_thumb")
     )
 
 # NEW: Profile Management
@@ -494,19 +1667,22 @@ async def update_profile(profile_data: UserProfileUpdate, current_user: dict = D
         if not profile_data.current_password or not profile_data.confirm_password:
             raise HTTPException(status_code=400, detail="Current password and confirmation required")
         
-        if not verify_password(profile_data.current_password, current_user["password_hash"]):
+        stored = await db.users.find_one({"id": current_user["id"]}, {"_id": 0, "password_hash": 1})
+        if not stored or not await verify_password(profile_data.current_password, stored["password_hash"]):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
         
         if profile_data.new_password != profile_data.confirm_password:
             raise HTTPException(status_code=400, detail="Passwords do not match")
         
-        update_dict["password_hash"] = get_password_hash(profile_data.new_password)
+        update_dict["password_hash"] = await get_password_hash(profile_data.new_password)
     
     if update_dict:
         await db.users.update_one(
             {"id": current_user["id"]},
             {"$set": update_dict}
         )
+        user_cache.invalidate(current_user["id"])
+        reference_cache.invalidate("users")
     
     return {"message": "Profile updated successfully"}
 
@@ -515,16 +1691,26 @@ async def upload_profile_photo(
     photo: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
-    # Read file and encode to base64
-    file_content = await photo.read()
-    photo_data = base64.b64encode(file_content).decode('utf-8')
+    file_content = await read_upload(photo, UPLOAD_LIMITS["profile"])
+    try:
+        photo_urls = await asyncio.to_thread(save_profile_photo, current_user["id"], file_content)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=400, detail="Uploaded image is too large")
     
     await db.users.update_one(
         {"id": current_user["id"]},
-        {"$set": {"profile_photo": photo_data}}
+        {"$set": photo_urls}
     )
+    user_cache.invalidate(current_user["id"])
+    reference_cache.invalidate("users")
     
-    return {"message": "Profile photo updated successfully", "photo_data": photo_data}
+    return {
+        "message": "Profile photo updated successfully",
+        "photo_url": photo_urls["profile_photo"],
+        "photo_thumb_url": photo_urls["profile_photo_thumb"]
+    }
 
 # NEW: Account Approval Endpoints
 @api_router.get("/accounts/pending")
@@ -534,16 +1720,8 @@ async def get_pending_accounts(current_user: dict = Depends(get_current_user)):
     
     query = {"account_status": "pending"}
     if current_user["role"] == "Manager":
-        user_division = current_user.get("division")
-        
-        # Build division filter to include sub-divisions
-        division_filter = [user_division]
-        if user_division == "TS":
-            division_filter.append("Apps")
-        elif user_division == "Infra":
-            division_filter.append("Fiberzone")
-        
-        query["division"] = {"$in": division_filter}
+        # Include sub-divisions
+        query["division"] = {"$in": managed_divisions(current_user.get("division"))}
         # FIX: Managers cannot see pending Manager accounts
         query["role"] = {"$ne": "Manager"}
     elif current_user["role"] == "VP":
@@ -564,19 +1742,8 @@ async def review_account(action_data: AccountApprovalAction, current_user: dict
         raise HTTPException(status_code=404, detail="User not found")
     
     if current_user["role"] == "Manager":
-        user_division = current_user.get("division")
-        target_user_division = user.get("division")
-        
         # Check if manager can review this user
-        allowed = False
-        if target_user_division == user_division:
-            allowed = True
-        elif user_division == "TS" and target_user_division == "Apps":
-            allowed = True
-        elif user_division == "Infra" and target_user_division == "Fiberzone":
-            allowed = True
-        
-        if not allowed:
+        if not can_manage_division(current_user.get("division"), user.get("division")):
             raise HTTPException(status_code=403, detail="Can only review accounts from your division or its sub-divisions")
         
         # FIX: Managers cannot review Manager accounts
@@ -594,6 +1761,10 @@ async def review_account(action_data: AccountApprovalAction, current_user: dict
         {"id": action_data.user_id},
         {"$set": {"account_status": new_status}}
     )
+    user_cache.invalidate(action_data.user_id)
+    reference_cache.invalidate("users")
+    if user.get("role") in APPROVER_ROLES:
+        approver_routing.invalidate()
     
     await create_notification(
         user_id=action_data.user_id,
@@ -617,16 +1788,15 @@ async def create_site(site_data: SiteCreate, current_user: dict = Depends(get_cu
     )
     
     doc = site.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.sites.insert_one(doc)
+    reference_cache.invalidate("sites")
     
     return {"message": "Site created successfully", "id": site.id}
 
 @api_router.get("/sites")
-async def get_sites(current_user: dict = Depends(get_current_user)):
+async def get_sites(request: Request, current_user: dict = Depends(get_current_user)):
     # FIX: Return all sites (including inactive) so they show up in the list
-    sites = await db.sites.find({}, {"_id": 0}).to_list(1000)
-    return sites
+    return reference_cache.response(request, await reference_cache.get("sites"))
 
 @api_router.get("/sites/{site_id}")
 async def get_site(site_id: str, current_user: dict = Depends(get_current_user)):
@@ -645,6 +1815,7 @@ async def update_site(site_id: str, site_data: SiteUpdate, current_user: dict =
             {"id": site_id},
             {"$set": update_dict}
         )
+        reference_cache.invalidate("sites")
     
     return {"message": "Site updated successfully"}
 
@@ -656,15 +1827,15 @@ async def delete_site(site_id: str, current_user: dict = Depends(get_current_use
         {"id": site_id},
         {"$set": {"status": "inactive"}}
     )
+    reference_cache.invalidate("sites")
     
     return {"message": "Site deleted successfully"}
 
 # ============ ACTIVITY CATEGORY ENDPOINTS (NEW) ============
 
 @api_router.get("/activity-categories")
-async def get_activity_categories(current_user: dict = Depends(get_current_user)):
-    categories = await db.activity_categories.find({}, {"_id": 0}).to_list(100)
-    return categories
+async def get_activity_categories(request: Request, current_user: dict = Depends(get_current_user)):
+    return reference_cache.response(request, await reference_cache.get("activity_categories"))
 
 @api_router.post("/activity-categories")
 async def create_activity_category(category_data: CategoryCreate, current_user: dict = Depends(get_current_user)):
@@ -683,8 +1854,8 @@ async def create_activity_category(category_data: CategoryCreate, current_user:
     )
     
     doc = category.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.activity_categories.insert_one(doc)
+    reference_cache.invalidate("activity_categories")
     
     return {"message": "Category created successfully", "id": category.id}
 
@@ -697,6 +1868,7 @@ async def delete_activity_category(category_id: str, current_user: dict = Depend
     result = await db.activity_categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    reference_cache.invalidate("activity_categories")
     
     return {"message": "Category deleted successfully"}
 
@@ -713,6 +1885,10 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
     result = await db.users.delete_one({"id": user_id})
+    user_cache.invalidate(user_id)
+    approver_routing.invalidate()
+    reference_cache.invalidate("users")
+    await db.notification_counters.delete_one({"user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -721,14 +1897,12 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
 # ============ USER ENDPOINTS ============
 
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(current_user: dict = Depends(get_current_user)):
-    users = await db.users.find({"account_status": "approved"}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return [UserResponse(**user) for user in users]
+async def get_users(request: Request, current_user: dict = Depends(get_current_user)):
+    return reference_cache.response(request, await reference_cache.get("users"))
 
 @api_router.get("/users/by-division/{division}", response_model=List[UserResponse])
-async def get_users_by_division(division: str, current_user: dict = Depends(get_current_user)):
-    users = await db.users.find({"division": division, "account_status": "approved"}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return [UserResponse(**user) for user in users]
+async def get_users_by_division(division: str, request: Request, current_user: dict = Depends(get_current_user)):
+    return reference_cache.response(request, await reference_cache.get_users_by_division(division))
 
 # ============ SCHEDULE ENDPOINTS (V1) ============
 
@@ -745,19 +1919,8 @@ async def create_schedule(schedule_data: ScheduleCreate, current_user: dict = De
     # PHASE 2: Managers and SPV can only create for their division
     # NEW: Allow TS&Apps Manager to assign for Apps, and Infra Manager to assign for Fiberzone
     if current_user["role"] in ["Manager", "SPV"]:
-        user_division = current_user.get("division")
-        target_division = schedule_data.division
-        
         # Check if assignment is allowed
-        allowed = False
-        if target_division == user_division:
-            allowed = True
-        elif user_division == "TS" and target_division == "Apps":
-            allowed = True
-        elif user_division == "Infra" and target_division == "Fiberzone":
-            allowed = True
-        
-        if not allowed:
+        if not can_manage_division(current_user.get("division"), schedule_data.division):
             raise HTTPException(status_code=403, detail="You can only create schedules for your division or its sub-divisions")
     
     # Enforce end_date to be 23:59:59 of the start_date
@@ -790,10 +1953,7 @@ async def create_schedule(schedule_data: ScheduleCreate, current_user: dict = De
         if site:
             schedule.site_name = site["name"]
     
-    doc = schedule.model_dump()
-    doc['start_date'] = doc['start_date'].isoformat()
-    doc['end_date'] = doc['end_date'].isoformat() if doc['end_date'] else None
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = wall_clock(schedule.model_dump())
     await db.schedules.insert_one(doc)
     
     await create_notification(
@@ -806,10 +1966,107 @@ async def create_schedule(schedule_data: ScheduleCreate, current_user: dict = De
     
     return {"message": "Schedule created successfully", "id": schedule.id}
 
+# ============ SPREADSHEET PARSING ============
+
+XLSX_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+XLSX_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+def _xlsx_column_index(cell_ref: str) -> int:
+    index = 0
+    for char in re.match(r"[A-Z]+", cell_ref).group():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+def _xlsx_first_sheet_path(archive: zipfile.ZipFile) -> str:
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheet = workbook.find("main:sheets/main:sheet", XLSX_NS)
+    if sheet is None:
+        raise ValueError("Workbook has no sheets")
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.findall("rel:Relationship", XLSX_NS):
+        if rel.get("Id") == sheet.get(XLSX_REL_ID):
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    raise ValueError("Workbook sheet relationship not found")
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> list:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f"{{{XLSX_NS['main']}}}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{{{XLSX_NS['main']}}}t")))
+                elem.clear()
+    return strings
+
+def iter_xlsx_rows(fileobj):
+    """Stream the first worksheet of an XLSX file as (row_number, cell strings)"""
+    archive = zipfile.ZipFile(fileobj)
+    shared_strings = _xlsx_shared_strings(archive)
+    row_tag = f"{{{XLSX_NS['main']}}}row"
+    with archive.open(_xlsx_first_sheet_path(archive)) as f:
+        row_num = 0
+        for _, elem in ET.iterparse(f):
+            if elem.tag != row_tag:
+                continue
+            values = {}
+            for cell in elem.findall("main:c", XLSX_NS):
+                cell_type = cell.get("t")
+                if cell_type == "inlineStr":
+                    value = "".join(t.text or "" for t in cell.iter(f"{{{XLSX_NS['main']}}}t"))
+                else:
+                    v = cell.find("main:v", XLSX_NS)
+                    value = v.text if v is not None and v.text is not None else ""
+                    if cell_type == "s" and value:
+                        try:
+                            value = shared_strings[int(value)]
+                        except IndexError:
+                            raise ValueError(f"Shared string index {value} out of range")
+                ref = cell.get("r")
+                values[_xlsx_column_index(ref) if ref else len(values)] = value
+            row_num = int(elem.get("r", row_num + 1))
+            elem.clear()
+            yield row_num, [values.get(i, "") for i in range(max(values) + 1)] if values else []
+
+def iter_upload_rows(upload: UploadFile):
+    """Yield (row_number, row_dict) from a CSV or XLSX upload without loading it whole"""
+    upload.file.seek(0)
+    if upload.filename.lower().endswith('.xlsx'):
+        rows = iter_xlsx_rows(upload.file)
+    else:
+        rows = enumerate(csv.reader(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')), start=1)
+    
+    header = None
+    for row_num, row in rows:
+        if header is None:
+            header = [h.strip() for h in row]
+            continue
+        if not any(str(value).strip() for value in row):
+            continue
+        yield row_num, {key: (row[i].strip() if i < len(row) else '') for i, key in enumerate(header)}
+
+def parse_sheet_datetime(value: str) -> datetime:
+    # XLSX date cells arrive as Excel serial numbers, CSV dates as ISO strings
+    try:
+        serial = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value)
+    try:
+        return EXCEL_EPOCH + timedelta(seconds=round(serial * 86400))
+    except (OverflowError, ValueError):
+        # e.g. 20251201 typed as a number, or inf/nan; reported as a row error
+        raise ValueError(f"date value out of range: {value}")
+
 # NEW: Bulk Schedule Upload
 @api_router.post("/schedules/bulk-upload")
 async def bulk_upload_schedules(
     file: UploadFile = File(...),
+    dry_run: bool = Form(False),
     current_user: dict = Depends(get_current_user)
 ):
     # PHASE 2: Extended to SPV
@@ -820,88 +2077,138 @@ async def bulk_upload_schedules(
     if current_user.get("division") == "Monitoring":
         raise HTTPException(status_code=403, detail="Monitoring division cannot create schedules")
     
-    if not file.filename.endswith(('.csv', '.xlsx')):
+    if not file.filename.lower().endswith(('.csv', '.xlsx')):
         raise HTTPException(status_code=400, detail="Only CSV or XLSX files are supported")
     
-    content = await file.read()
+    created_count = 0
+    errors = []
+    rows = iter_upload_rows(file)
     
     try:
-        # Parse CSV
-        decoded = content.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(decoded))
-        
-        created_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(csv_reader, start=2):
-            try:
-                # Expected columns: user_email, title, description, start_date, end_date
-                user = await db.users.find_one({"email": row['user_email']}, {"_id": 0})
-                if not user:
-                    errors.append(f"Row {row_num}: User not found - {row['user_email']}")
-                    continue
-                
-                
-                # NEW: Allow cross-division assignment for Apps and Fiberzone
-                if current_user["role"] in ["Manager", "SPV"]:
-                    user_division = current_user.get("division")
-                    target_division = user.get("division")
+        while True:
+            # Parse the next chunk off the event loop
+            chunk = await asyncio.to_thread(lambda: list(islice(rows, BULK_UPLOAD_CHUNK_SIZE)))
+            if not chunk:
+                break
+            
+            # Expected columns: user_email, title, description, start_date, end_date
+            emails = list({row.get('user_email', '') for _, row in chunk})
+            users = await db.users.find(
+                {"email": {"$in": emails}},
+                {"_id": 0, "id": 1, "username": 1, "email": 1, "division": 1}
+            ).to_list(None)
+            users_by_email = {u["email"]: u for u in users}
+            
+            schedule_docs = []
+            notification_docs = []
+            for row_num, row in chunk:
+                try:
+                    user = users_by_email.get(row.get('user_email', ''))
+                    if not user:
+                        errors.append(f"Row {row_num}: User not found - {row.get('user_email', '')}")
+                        continue
                     
-                    allowed = False
-                    if target_division == user_division:
-                        allowed = True
-                    elif user_division == "TS" and target_division == "Apps":
-                        allowed = True
-                    elif user_division == "Infra" and target_division == "Fiberzone":
-                        allowed = True
+                    # NEW: Allow cross-division assignment for Apps and Fiberzone
+                    if current_user["role"] in ["Manager", "SPV"]:
+                        if not can_manage_division(current_user.get("division"), user.get("division")):
+                            errors.append(f"Row {row_num}: Cannot assign schedule to user from different division")
+                            continue
                     
-                    if not allowed:
-                        errors.append(f"Row {row_num}: Cannot assign schedule to user from different division")
+                    if not row.get('title'):
+                        errors.append(f"Row {row_num}: Missing title")
                         continue
-                
-                schedule = Schedule(
-                    user_id=user["id"],
-                    user_name=user["username"],
-                    division=user.get("division", ""),
-                    title=row['title'],
-                    description=row.get('description', ''),
-                    start_date=datetime.fromisoformat(row['start_date']),
-                    end_date=datetime.fromisoformat(row['end_date']),
-                    created_by=current_user["id"]
-                )
-                
-                doc = schedule.model_dump()
-                doc['start_date'] = doc['start_date'].isoformat()
-                doc['end_date'] = doc['end_date'].isoformat()
-                doc['created_at'] = doc['created_at'].isoformat()
-                await db.schedules.insert_one(doc)
-                
-                await create_notification(
-                    user_id=user["id"],
-                    title="New Schedule Assigned",
-                    message=f"You have been assigned: {row['title']}",
-                    notification_type="schedule",
-                    related_id=schedule.id
-                )
-                
-                created_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-        
-        return {
-            "message": f"Bulk upload completed. {created_count} schedules created.",
-            "created_count": created_count,
-            "errors": errors
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to process file: {str(e)}")
+                    
+                    start_date = parse_sheet_datetime(row['start_date'])
+                    # PHASE 2: end_date is optional, defaults to the end of the start day
+                    if row.get('end_date'):
+                        end_date = parse_sheet_datetime(row['end_date'])
+                    else:
+                        end_date = start_date.replace(hour=23, minute=59, second=59, microsecond=0)
+                    
+                    schedule = Schedule(
+                        user_id=user["id"],
+                        user_name=user["username"],
+                        division=user.get("division") or "",
+                        title=row['title'],
+                        description=row.get('description', ''),
+                        start_date=start_date,
+                        end_date=end_date,
+                        created_by=current_user["id"]
+                    )
+                    
+                    doc = wall_clock(schedule.model_dump())
+                    schedule_docs.append(doc)
+                    
+                    notification_docs.append(build_notification(
+                        user_id=user["id"],
+                        title="New Schedule Assigned",
+                        message=f"You have been assigned: {row['title']}",
+                        notification_type="schedule",
+                        related_id=schedule.id
+                    ))
+                    
+                except (KeyError, ValueError) as e:
+                    errors.append(f"Row {row_num}: {str(e)}")
+            
+            if schedule_docs and not dry_run:
+                await db.schedules.insert_many(schedule_docs, ordered=False)
+                await create_notifications(notification_docs)
+            created_count += len(schedule_docs)
+    
+    except (ValueError, KeyError, csv.Error, zipfile.BadZipFile, ET.ParseError, UnicodeDecodeError) as e:
+        if created_count == 0 and not errors:
+            raise HTTPException(status_code=400, detail=f"Failed to process file: {str(e)}")
+        errors.append(f"Stopped reading file: {str(e)}")
+    
+    if dry_run:
+        message = f"Dry run completed. {created_count} schedules would be created."
+    else:
+        message = f"Bulk upload completed. {created_count} schedules created."
+    
+    return {
+        "message": message,
+        "created_count": created_count,
+        "dry_run": dry_run,
+        "errors": errors
+    }
+
+SCHEDULE_SORT = [("start_date", ASCENDING), ("id", ASCENDING)]
 
 @api_router.get("/schedules")
-async def get_schedules(current_user: dict = Depends(get_current_user)):
-    schedules = await db.schedules.find({}, {"_id": 0}).to_list(10000)
-    return schedules
+async def get_schedules(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    division: Optional[str] = None,
+    user_id: Optional[str] = None,
+    site_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    legacy: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    # Compatibility: the old unfiltered, unpaginated dump
+    if legacy:
+        schedules = await db.schedules.find({}, {"_id": 0}).to_list(10000)
+        return [wall_clock(s) for s in schedules]
+    
+    query = {}
+    start_date = parse_iso_param(start, "start", wall_clock=True)
+    end_date = parse_iso_param(end, "end", wall_clock=True)
+    if start_date or end_date:
+        add_date_range(query, "start_date", start_date, end_date)
+    if division and division != "all":
+        query["division"] = division
+    if user_id and user_id != "all":
+        query["user_id"] = user_id
+    if site_id:
+        query["site_id"] = site_id
+    if category_id and category_id != "all":
+        query["category_id"] = category_id
+    
+    page = await paginate(db.schedules, query, SCHEDULE_SORT, cursor, limit)
+    page["items"] = [wall_clock(s) for s in page["items"]]
+    return page
 
 @api_router.delete("/schedules/{schedule_id}")
 async def delete_schedule(schedule_id: str, current_user: dict = Depends(get_current_user)):
@@ -925,18 +2232,7 @@ async def delete_schedule(schedule_id: str, current_user: dict = Depends(get_cur
         # PHASE 2: Manager and SPV can only delete from their division
         # NEW: Allow cross-division for Apps and Fiberzone
         if current_user["role"] in ["Manager", "SPV"]:
-            user_division = current_user.get("division")
-            schedule_division = schedule["division"]
-            
-            allowed = False
-            if schedule_division == user_division:
-                allowed = True
-            elif user_division == "TS" and schedule_division == "Apps":
-                allowed = True
-            elif user_division == "Infra" and schedule_division == "Fiberzone":
-                allowed = True
-            
-            if not allowed:
+            if not can_manage_division(current_user.get("division"), schedule["division"]):
                 raise HTTPException(status_code=403, detail="You can only delete schedules from your division or its sub-divisions")
     
     result = await db.schedules.delete_one({"id": schedule_id})
@@ -970,18 +2266,7 @@ async def update_schedule(schedule_id: str, update_data: ScheduleUpdate, current
         # PHASE 2: Manager and SPV can only edit from their division
         # NEW: Allow cross-division for Apps and Fiberzone
         if current_user["role"] in ["Manager", "SPV"]:
-            user_division = current_user.get("division")
-            schedule_division = schedule["division"]
-            
-            allowed = False
-            if schedule_division == user_division:
-                allowed = True
-            elif user_division == "TS" and schedule_division == "Apps":
-                allowed = True
-            elif user_division == "Infra" and schedule_division == "Fiberzone":
-                allowed = True
-            
-            if not allowed:
+            if not can_manage_division(current_user.get("division"), schedule["division"]):
                 raise HTTPException(status_code=403, detail="You can only edit schedules from your division or its sub-divisions")
     
     update_dict = {}
@@ -994,9 +2279,9 @@ async def update_schedule(schedule_id: str, update_data: ScheduleUpdate, current
     if update_data.description is not None:
         update_dict["description"] = update_data.description
     if update_data.start_date:
-        update_dict["start_date"] = datetime.fromisoformat(update_data.start_date).isoformat()
+        update_dict["start_date"] = to_bson_datetime(update_data.start_date, wall_clock=True)
     if update_data.end_date:
-        update_dict["end_date"] = datetime.fromisoformat(update_data.end_date).isoformat()
+        update_dict["end_date"] = to_bson_datetime(update_data.end_date, wall_clock=True)
     if update_data.site_id is not None:
         update_dict["site_id"] = update_data.site_id
         # Get site name
@@ -1012,6 +2297,11 @@ async def update_schedule(schedule_id: str, update_data: ScheduleUpdate, current
             {"id": schedule_id},
             {"$set": update_dict}
         )
+        if "user_id" in update_dict:
+            await db.shift_change_requests.update_many(
+                {"schedule_id": schedule_id},
+                {"$set": {"user_id": update_dict["user_id"]}}
+            )
     
     return {"message": "Schedule updated successfully"}
 
@@ -1034,23 +2324,21 @@ async def create_shift_change_request(
         schedule_id=request_data.schedule_id,
         requested_by=current_user["id"],
         requested_by_name=current_user["username"],
+        division=schedule.get("division"),
+        user_id=schedule["user_id"],
         reason=request_data.reason,
         new_start_date=datetime.fromisoformat(request_data.new_start_date),
         new_end_date=datetime.fromisoformat(request_data.new_end_date)
     )
     
-    doc = request.model_dump()
-    doc['new_start_date'] = doc['new_start_date'].isoformat()
-    doc['new_end_date'] = doc['new_end_date'].isoformat()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
+    doc = wall_clock(request.model_dump())
     await db.shift_change_requests.insert_one(doc)
     
     # Notify division manager
-    manager = await db.users.find_one({"role": "Manager", "division": schedule["division"]}, {"_id": 0})
-    if manager:
+    manager_id = await approver_routing.get_id("Manager", schedule["division"])
+    if manager_id:
         await create_notification(
-            user_id=manager["id"],
+            user_id=manager_id,
             title="Shift Change Request",
             message=f"{current_user['username']} requested a shift change",
             notification_type="shift_change",
@@ -1059,23 +2347,50 @@ async def create_shift_change_request(
     
     return {"message": "Shift change request submitted", "id": request.id}
 
+BACKFILL_BATCH_SIZE = 500
+
+async def backfill_shift_change_divisions() -> int:
+    """Stamp division and user_id from the schedule onto older requests; returns the number updated"""
+    updated = 0
+    while True:
+        requests = await db.shift_change_requests.find(
+            {"division": {"$exists": False}},
+            {"_id": 0, "id": 1, "schedule_id": 1}
+        ).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+        if not requests:
+            return updated
+        
+        schedules = await db.schedules.find(
+            {"id": {"$in": list({r["schedule_id"] for r in requests})}},
+            {"_id": 0, "id": 1, "division": 1, "user_id": 1}
+        ).to_list(None)
+        schedules_by_id = {s["id"]: s for s in schedules}
+        
+        operations = []
+        for request in requests:
+            # Requests whose schedule is gone get a null division so they are not revisited
+            schedule = schedules_by_id.get(request["schedule_id"], {})
+            operations.append(UpdateOne(
+                {"id": request["id"]},
+                {"$set": {"division": schedule.get("division"), "user_id": schedule.get("user_id")}}
+            ))
+        await db.shift_change_requests.bulk_write(operations, ordered=False)
+        updated += len(operations)
+
 @api_router.get("/schedules/change-requests")
 async def get_shift_change_requests(current_user: dict = Depends(get_current_user)):
     if current_user["role"] in ["Manager", "VP"]:
         # Managers see requests from their division
         query = {"status": "pending"}
         if current_user["role"] == "Manager":
-            # Get all schedules from manager's division
-            schedules = await db.schedules.find({"division": current_user.get("division")}, {"_id": 0}).to_list(10000)
-            schedule_ids = [s["id"] for s in schedules]
-            query["schedule_id"] = {"$in": schedule_ids}
+            query["division"] = current_user.get("division")
         
-        requests = await db.shift_change_requests.find(query, {"_id": 0}).to_list(1000)
+        requests = await db.shift_change_requests.find(query, {"_id": 0}).sort("created_at", DESCENDING).to_list(1000)
     else:
         # Staff see their own requests
         requests = await db.shift_change_requests.find({"requested_by": current_user["id"]}, {"_id": 0}).to_list(1000)
     
-    return requests
+    return [wall_clock(r) for r in requests]
 
 @api_router.post("/schedules/change-requests/review")
 async def review_shift_change_request(
@@ -1104,7 +2419,7 @@ async def review_shift_change_request(
                 "status": new_status,
                 "reviewed_by": current_user["id"],
                 "review_comment": action_data.comment,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             }
         }
     )
@@ -1115,8 +2430,8 @@ async def review_shift_change_request(
             {"id": request["schedule_id"]},
             {
                 "$set": {
-                    "start_date": request["new_start_date"],
-                    "end_date": request["new_end_date"]
+                    "start_date": to_bson_datetime(request["new_start_date"], wall_clock=True),
+                    "end_date": to_bson_datetime(request["new_end_date"], wall_clock=True)
                 }
             }
         )
@@ -1132,8 +2447,93 @@ async def review_shift_change_request(
     
     return {"message": f"Request {new_status}"}
 
+# Declared after the /schedules/change-requests routes so it does not capture them
+@api_router.get("/schedules/{schedule_id}")
+async def get_schedule(schedule_id: str, current_user: dict = Depends(get_current_user)):
+    schedule = await db.schedules.find_one({"id": schedule_id}, {"_id": 0})
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return wall_clock(schedule)
+
 # ============ ACTIVITY ENDPOINTS (NEW) ============
 
+PROGRESS_UPDATE_SORT = [("timestamp", ASCENDING), ("id", ASCENDING)]
+
+def _migrated_progress_update(activity: dict, index: int, update: dict) -> dict:
+    try:
+        timestamp = to_bson_datetime(update.get("timestamp") or activity["created_at"])
+    except (TypeError, ValueError):
+        timestamp = to_bson_datetime(activity["created_at"])
+    doc = {key: value for key, value in update.items() if key != "timestamp"}
+    doc.update({
+        # Deterministic, so a re-run after an interrupted batch upserts the same documents
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"progress-update:{activity['id']}:{index}")),
+        "activity_id": activity["id"],
+        "schedule_id": activity["schedule_id"],
+        "user_id": activity.get("user_id"),
+        "timestamp": timestamp
+    })
+    return doc
+
+async def migrate_progress_updates() -> int:
+    """Move embedded progress_updates arrays into their own collection; returns the number of activities migrated"""
+    migrated = 0
+    while True:
+        activities = await db.activities.find(
+            {"progress_updates": {"$exists": True}},
+            {"_id": 0, "id": 1, "schedule_id": 1, "user_id": 1, "created_at": 1, "progress_updates": 1}
+        ).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+        if not activities:
+            return migrated
+        
+        operations = []
+        for activity in activities:
+            for index, update in enumerate(activity["progress_updates"] or []):
+                doc = _migrated_progress_update(activity, index, update)
+                operations.append(UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True))
+        if operations:
+            await db.progress_updates.bulk_write(operations, ordered=False)
+        
+        # Only after the copies exist; the $exists guard keeps the count from being added twice
+        await db.activities.bulk_write([
+            UpdateOne(
+                {"id": activity["id"], "progress_updates": {"$exists": True}},
+                {
+                    "$unset": {"progress_updates": ""},
+                    "$inc": {"progress_update_count": len(activity["progress_updates"] or [])}
+                }
+            )
+            for activity in activities
+        ], ordered=False)
+        migrated += len(activities)
+
+async def collect_schedule_activity(schedule_ids: list) -> dict:
+    """Latest activity and time-ordered progress updates per schedule"""
+    if not schedule_ids:
+        return {}
+    
+    pipeline = [
+        {"$match": {"schedule_id": {"$in": schedule_ids}}},
+        {"$sort": {"schedule_id": 1, "created_at": 1}},
+        {"$group": {"_id": "$schedule_id", "latest": {"$last": "$$ROOT"}}},
+        {"$unset": ["latest._id", "latest.progress_updates"]}
+    ]
+    grouped = {}
+    async for entry in db.activities.aggregate(pipeline):
+        entry["latest"]["progress_updates"] = []
+        entry["progress_updates"] = []
+        grouped[entry["_id"]] = entry
+    
+    updates = db.progress_updates.find(
+        {"schedule_id": {"$in": list(grouped)}}, {"_id": 0}
+    ).sort([("schedule_id", ASCENDING)] + PROGRESS_UPDATE_SORT)
+    async for update in updates:
+        entry = grouped[update["schedule_id"]]
+        entry["progress_updates"].append(update)
+        if update["activity_id"] == entry["latest"]["id"]:
+            entry["latest"]["progress_updates"].append(update)
+    return grouped
+
 @api_router.get("/activities/today")
 async def get_todays_schedules(current_user: dict = Depends(get_current_user)):
     """Get today's schedules for the logged-in user (primarily for Staff)"""
@@ -1142,39 +2542,20 @@ async def get_todays_schedules(current_user: dict = Depends(get_current_user)):
     today_end = datetime.now(timezone.utc).replace(hour=23, minute=59, second=59, microsecond=999999)
     
     # Query schedules for current user where start_date is today
-    schedules = await db.schedules.find({
-        "user_id": current_user["id"],
-        "start_date": {
-            "$gte": today_start.isoformat(),
-            "$lte": today_end.isoformat()
-        }
-    }, {"_id": 0}).to_list(1000)
+    query = add_date_range({"user_id": current_user["id"]}, "start_date", today_start, today_end)
+    schedules = await db.schedules.find(query, {"_id": 0}).to_list(1000)
+    
+    # Latest activity status and all progress updates for every schedule at once
+    activity_by_schedule = await collect_schedule_activity([s["id"] for s in schedules])
     
-    # For each schedule, get the latest activity status if exists
     for schedule in schedules:
-        # Fetch ALL activities for this schedule to aggregate progress updates
-        all_activities = await db.activities.find(
-            {"schedule_id": schedule["id"]},
-            {"_id": 0}
-        ).sort("created_at", 1).to_list(length=None)
+        wall_clock(schedule)
+        entry = activity_by_schedule.get(schedule["id"])
+        latest_activity = entry["latest"] if entry else None
         
-        all_progress_updates = []
-        latest_activity = None
-        
-        if all_activities:
-            latest_activity = all_activities[-1] # Last one is latest due to sort
-            for act in all_activities:
-                if "progress_updates" in act and act["progress_updates"]:
-                    all_progress_updates.extend(act["progress_updates"])
-            
-            # Sort updates by timestamp
-            all_progress_updates.sort(key=lambda x: x["timestamp"])
-
-
-            
         schedule["activity_status"] = latest_activity["status"] if latest_activity else "Pending"
         schedule["latest_activity"] = latest_activity
-        schedule["all_progress_updates"] = all_progress_updates
+        schedule["all_progress_updates"] = entry["progress_updates"] if entry else []
     
     return schedules
 
@@ -1223,16 +2604,14 @@ async def create_activity(activity_data: ActivityCreate, current_user: dict = De
     )
     
     doc = activity.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
     await db.activities.insert_one(doc)
 
     # Special logic for Hold status - notify Manager
     if activity_data.action_type == "hold":
-        manager = await db.users.find_one({"role": "Manager", "division": schedule["division"]}, {"_id": 0})
-        if manager:
+        manager_id = await approver_routing.get_id("Manager", schedule["division"])
+        if manager_id:
             await create_notification(
-                user_id=manager["id"],
+                user_id=manager_id,
                 title="Task On Hold",
                 message=f"{current_user['username']} has put task '{schedule['title']}' on hold",
                 notification_type="activity",
@@ -1254,7 +2633,7 @@ async def get_activities(current_user: dict = Depends(get_current_user)):
         query["division"] = current_user.get("division")
     # VP sees all activities (no filter)
     
-    activities = await db.activities.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    activities = await db.activities.find(query, {"_id": 0, "progress_updates": 0}).sort("created_at", -1).to_list(1000)
     return activities
 
 @api_router.post("/activities/progress-update")
@@ -1278,79 +2657,243 @@ async def add_progress_update(
     
     image_url = None
     if file:
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
-        
-        # Create activity-specific folder
-        activity_dir = UPLOAD_DIR / "activities" / activity_id
-        activity_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = activity_dir / unique_filename
-        
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Set URL
-        image_url = f"/uploads/activities/{activity_id}/{unique_filename}"
-
-    # Create the progress update with timestamp
-    progress_update = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "update_text": update_text,
-        "update_text": update_text,
-        "user_name": current_user["username"],
-        "image_url": image_url,
-        "latitude": latitude,
-        "longitude": longitude
-    }
-    
-    # Add to the activity's progress_updates array
+        # Stored once per distinct content
+        blob = await store_blob(file, UPLOAD_LIMITS["progress"])
+        image_url = blob["url"]
+
+    progress_update = ProgressUpdate(
+        activity_id=activity_id,
+        schedule_id=activity["schedule_id"],
+        user_id=current_user["id"],
+        user_name=current_user["username"],
+        update_text=update_text,
+        image_url=image_url,
+        latitude=latitude,
+        longitude=longitude
+    )
+    await db.progress_updates.insert_one(progress_update.model_dump())
     await db.activities.update_one(
         {"id": activity_id},
         {
-            "$push": {"progress_updates": progress_update},
-            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+            "$inc": {"progress_update_count": 1},
+            "$set": {"updated_at": progress_update.timestamp}
         }
     )
     
+    # Web-sized and thumbnail variants are rendered in the background
+    if image_url:
+        image_variant_worker.submit(image_url)
+    
     return {"message": "Progress update added successfully"}
 
 @api_router.get("/activities/schedule/{schedule_id}")
 async def get_schedule_activity(schedule_id: str, current_user: dict = Depends(get_current_user)):
     # Public endpoint for authenticated users to see activity details
-    # Fetch ALL activities to aggregate updates
-    all_activities = await db.activities.find(
+    response = await db.activities.find_one(
         {"schedule_id": schedule_id},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(length=None)
-    
-    if not all_activities:
+        {"_id": 0, "progress_updates": 0},
+        sort=[("created_at", DESCENDING)]
+    )
+    if not response:
         return None
-        
-    latest_activity = all_activities[-1]
-    all_progress_updates = []
-    
-    for act in all_activities:
-        if "progress_updates" in act and act["progress_updates"]:
-            all_progress_updates.extend(act["progress_updates"])
-            
-    all_progress_updates.sort(key=lambda x: x["timestamp"])
-    
-    # Prepare response based on latest activity but with ALL updates
-    response = latest_activity.copy()
     
-
-        
-    response["progress_updates"] = all_progress_updates # Override with aggregated list
-        
+    # Latest activity with the first page of the schedule's updates across all its activities
+    page = await paginate(db.progress_updates, {"schedule_id": schedule_id}, PROGRESS_UPDATE_SORT, None, PROGRESS_UPDATE_PAGE_SIZE)
+    response["progress_updates"] = page["items"]
+    response["progress_updates_next_cursor"] = page["next_cursor"]
     return response
 
+@api_router.get("/activities/schedule/{schedule_id}/progress-updates")
+async def get_schedule_progress_updates(
+    schedule_id: str,
+    cursor: Optional[str] = None,
+    limit: int = PROGRESS_UPDATE_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """Progress updates across a schedule's activities, oldest first, one page at a time"""
+    return await paginate(db.progress_updates, {"schedule_id": schedule_id}, PROGRESS_UPDATE_SORT, cursor, limit)
+
+@api_router.get("/activities/{activity_id}/progress-updates")
+async def get_activity_progress_updates(
+    activity_id: str,
+    cursor: Optional[str] = None,
+    limit: int = PROGRESS_UPDATE_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """Progress updates of a single activity, oldest first, one page at a time"""
+    return await paginate(db.progress_updates, {"activity_id": activity_id}, PROGRESS_UPDATE_SORT, cursor, limit)
+
+
+# ============ COMMENT THREADS ============
+
+# Comments live in their own collection keyed by (parent_type, parent_id); parents
+# carry only comment_count and last_comment_at, so list payloads stay the same size.
+# Pages run from the newest comment backwards; each page is served oldest first.
+COMMENT_PARENTS = {"report": "reports", "ticket": "tickets"}
+COMMENT_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+def serve_comment(comment: dict) -> dict:
+    # Ticket clients read the body as `comment`
+    if comment["parent_type"] == "ticket":
+        comment["comment"] = comment["text"]
+    return comment
+
+async def add_comment(parent_type: str, parent_id: str, current_user: dict, text: str) -> dict:
+    comment = Comment(
+        parent_type=parent_type,
+        parent_id=parent_id,
+        user_id=current_user["id"],
+        user_name=current_user["username"],
+        text=text
+    )
+    doc = comment.model_dump()
+    await db.comments.insert_one(doc)
+    await db[COMMENT_PARENTS[parent_type]].update_one(
+        {"id": parent_id},
+        {"$inc": {"comment_count": 1}, "$max": {"last_comment_at": comment.created_at}}
+    )
+    doc.pop("_id", None)
+    return serve_comment(doc)
+
+async def comment_page(parent_type: str, parent_id: str, cursor: Optional[str] = None, limit: int = COMMENT_PAGE_SIZE) -> dict:
+    page = await paginate(db.comments, {"parent_type": parent_type, "parent_id": parent_id}, COMMENT_SORT, cursor, limit)
+    page["items"] = [serve_comment(c) for c in reversed(page["items"])]
+    return page
+
+async def attach_first_comment_page(parent_type: str, parent: dict) -> dict:
+    """Embed the newest page of comments; the cursor fetches the ones before it"""
+    page = await comment_page(parent_type, parent["id"])
+    parent["comments"] = page["items"]
+    parent["comments_next_cursor"] = page["next_cursor"]
+    return parent
+
+def _migrated_comment(parent_type: str, parent: dict, index: int, comment: dict) -> dict:
+    try:
+        created_at = stored_datetime(comment.get("created_at") or parent["created_at"])
+    except (TypeError, ValueError):
+        created_at = stored_datetime(parent["created_at"])
+    return {
+        # Embedded comments already have ids; deterministic otherwise so re-runs upsert in place
+        "id": comment.get("id") or str(uuid.uuid5(uuid.NAMESPACE_URL, f"comment:{parent_type}:{parent['id']}:{index}")),
+        "parent_type": parent_type,
+        "parent_id": parent["id"],
+        "user_id": comment.get("user_id"),
+        "user_name": comment.get("user_name"),
+        "text": comment.get("text", comment.get("comment", "")),
+        "created_at": created_at
+    }
+
+async def migrate_comments() -> int:
+    """Move embedded comments arrays into the comments collection; returns the number of parents migrated"""
+    migrated = 0
+    for parent_type, collection in COMMENT_PARENTS.items():
+        while True:
+            parents = await db[collection].find(
+                {"comments": {"$exists": True}},
+                {"_id": 0, "id": 1, "created_at": 1, "comments": 1}
+            ).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+            if not parents:
+                break
+            
+            operations = []
+            parent_updates = []
+            for parent in parents:
+                comments = [_migrated_comment(parent_type, parent, i, c) for i, c in enumerate(parent["comments"] or [])]
+                operations.extend(UpdateOne({"id": c["id"]}, {"$setOnInsert": c}, upsert=True) for c in comments)
+                
+                update = {"$unset": {"comments": ""}, "$inc": {"comment_count": len(comments)}}
+                if comments:
+                    update["$max"] = {"last_comment_at": max(c["created_at"] for c in comments)}
+                # The $exists guard keeps a re-run from counting the same comments twice
+                parent_updates.append(UpdateOne({"id": parent["id"], "comments": {"$exists": True}}, update))
+            if operations:
+                await db.comments.bulk_write(operations, ordered=False)
+            await db[collection].bulk_write(parent_updates, ordered=False)
+            migrated += len(parents)
+    return migrated
+
+# ============ REPORT APPROVAL STATE MACHINE ============
+
+# Pending SPV -> Pending Manager -> Pending VP -> Final. A Manager approving at Pending SPV
+# skips to Pending VP and the VP finalizes from any stage. Revisi hands the report back to
+# its submitter, whose next edit restarts the flow at the first available approver.
+REPORT_APPROVAL_FLOW = {"Pending SPV": "Pending Manager", "Pending Manager": "Pending VP", "Pending VP": "Final"}
+PENDING_STATUS_ROLE = {"Pending SPV": "SPV", "Pending Manager": "Manager", "Pending VP": "VP"}
+
+async def report_submitter_division(report: dict) -> Optional[str]:
+    if "submitter_division" in report:
+        return report["submitter_division"]
+    # Not yet backfilled
+    submitter = await db.users.find_one({"id": report["submitted_by"]}, {"_id": 0, "division": 1})
+    return submitter.get("division") if submitter else None
+
+async def can_review_report(report: dict, user: dict) -> bool:
+    # VP can approve at any stage
+    # Manager can approve if status is "Pending SPV" or "Pending Manager" AND it's their division
+    # Anyone else only as the current approver
+    if user["role"] == "VP":
+        return True
+    if user["role"] == "Manager" and report["status"] in ["Pending SPV", "Pending Manager"]:
+        return user.get("division") == approval_division(await report_submitter_division(report))
+    return report.get("current_approver") == user["id"]
+
+def next_report_status(report: dict, user: dict) -> Optional[str]:
+    """The status an approval by user moves the report to, or None if it can't be approved"""
+    if report["status"] == "Final":
+        return None
+    if user["role"] == "VP":
+        return "Final"
+    if user["role"] == "Manager" and report["status"] == "Pending SPV":
+        return "Pending VP"
+    return REPORT_APPROVAL_FLOW.get(report["status"])
+
+async def approver_for_status(status: str, division: Optional[str]) -> Optional[str]:
+    role = PENDING_STATUS_ROLE.get(status)
+    return await approver_routing.get_id(role, approval_division(division)) if role else None
+
+async def apply_report_transition(report: dict, changes: dict) -> dict:
+    """Write changes only if the report still has the status and version it was read with"""
+    updated = await db.reports.find_one_and_update(
+        {"id": report["id"], "status": report["status"], "version": report.get("version")},
+        {"$set": {**changes, "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0, "file_data": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        raise HTTPException(status_code=409, detail="This report was changed by someone else. Reload it and try again.")
+    return updated
 
 # ============ REPORT ENDPOINTS (V2) - UPDATED ============
 
+# The division groups the report list filters by
+DIVISION_GROUPS = {
+    "Monitoring": "Monitoring",
+    "Infra": "Infra & Fiberzone",
+    "Fiberzone": "Infra & Fiberzone",
+    "TS": "TS & Apps",
+    "Apps": "TS & Apps",
+}
+
+def submitter_division_fields(division: Optional[str]) -> dict:
+    return {"submitter_division": division, "submitter_division_group": DIVISION_GROUPS.get(division)}
+
+async def sync_report_divisions(user_id: str, division: Optional[str]) -> int:
+    """Restamp a user's reports after their division changes; returns the number updated"""
+    fields = submitter_division_fields(division)
+    result = await db.reports.update_many(
+        {"submitted_by": user_id, "$or": [{field: {"$ne": value}} for field, value in fields.items()]},
+        {"$set": fields}
+    )
+    return result.modified_count
+
+async def backfill_report_divisions() -> int:
+    """Stamp every report with its submitter's current division; returns the number updated"""
+    updated = 0
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "division": 1}):
+        updated += await sync_report_divisions(user["id"], user.get("division"))
+    return updated
+
+
 @api_router.post("/reports")
 async def create_report(
     title: str = Form(...),
@@ -1361,31 +2904,16 @@ async def create_report(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
-    # Get site name if site_id provided for Folder Organization
+    # Get site name if site_id provided
     site_name = None
-    folder_name = "Unassigned"
-    
     if site_id:
         site = await db.sites.find_one({"id": site_id}, {"_id": 0})
         if site:
             site_name = site["name"]
-            # Sanitize folder name
-            folder_name = "".join(c for c in site_name if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
 
-    # Prepare file storage for report
-    reports_dir = UPLOAD_DIR / "reports" / folder_name
-    reports_dir.mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"report_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
-    file_path = reports_dir / unique_filename
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    file_url = f"/uploads/reports/{folder_name}/{unique_filename}"
+    # Save file, stored once per distinct content
+    blob = await store_blob(file, UPLOAD_LIMITS["report"])
+    file_url = blob["url"]
     file_data = None # No longer storing base64 for new reports
     
     # Get category name if category_id provided
@@ -1397,26 +2925,11 @@ async def create_report(
     
     if current_user["role"] == "Staff":
         status = "Pending SPV"
-        # NEW: Route Apps to TS SPV, Fiberzone to Infra SPV
-        target_division = current_user.get("division")
-        if target_division == "Apps":
-            target_division = "TS"
-        elif target_division == "Fiberzone":
-            target_division = "Infra"
-            
-        spv = await db.users.find_one({"role": "SPV", "division": target_division}, {"_id": 0})
-        current_approver = spv["id"] if spv else None
+        # Apps route to the TS SPV, Fiberzone to the Infra SPV
+        current_approver = await approver_routing.get_id("SPV", approval_division(current_user.get("division")))
     else:
         status = "Pending Manager"
-        # NEW: Route Apps to TS Manager, Fiberzone to Infra Manager
-        target_division = current_user.get("division")
-        if target_division == "Apps":
-            target_division = "TS"
-        elif target_division == "Fiberzone":
-            target_division = "Infra"
-            
-        manager = await db.users.find_one({"role": "Manager", "division": target_division}, {"_id": 0})
-        current_approver = manager["id"] if manager else None
+        current_approver = await approver_routing.get_id("Manager", approval_division(current_user.get("division")))
     
     report = Report(
         category_id=category_id,
@@ -1432,13 +2945,13 @@ async def create_report(
         current_approver=current_approver,
         ticket_id=ticket_id,
         site_id=site_id,
-        site_name=site_name
+        site_name=site_name,
+        **submitter_division_fields(current_user.get("division"))
     )
     
     doc = report.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
     await db.reports.insert_one(doc)
+    await apply_report_rollup(doc, 1)
     
     if current_approver:
         await create_notification(
@@ -1451,205 +2964,116 @@ async def create_report(
     
     return {"message": "Report submitted successfully", "id": report.id}
 
+REPORT_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+REPORT_SEARCH_FIELDS = ("title", "description", "submitted_by_name", "site_name")
+
+# List view fields; descriptions and comments are only served by GET /reports/{id}
+REPORT_LIST_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in (
+        "id", "category_id", "category_name", "title", "file_name", "file_url", "status",
+        "submitted_by", "submitted_by_name", "current_approver", "ticket_id", "site_id", "site_name",
+        "submitter_division", "submitter_division_group", "version", "rejection_comment",
+        "comment_count", "last_comment_at", "created_at", "updated_at"
+    )},
+}
+
 @api_router.get("/reports")
 async def get_reports(
     site_id: Optional[str] = None, 
     division: Optional[str] = None,
+    status: Optional[str] = None,
+    exclude_final: bool = False,
+    category_id: Optional[str] = None,
+    submitted_by: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    q: Optional[str] = None,
+    order: str = "newest",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    legacy: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     # Universal visibility - all users can view all reports, but can filter
-    
-    # Start with aggregation pipeline
-    pipeline = []
-    
-    # Match stage for site_id if provided
-    match_stage = {}
+    query = {}
     if site_id:
-        match_stage["site_id"] = site_id
+        query["site_id"] = site_id
     
-    if match_stage:
-        pipeline.append({"$match": match_stage})
-        
-    # User lookup for division filtering
-    if division and division != "all":
-        # Lookup user info to check division
-        pipeline.append({
-            "$lookup": {
-                "from": "users",
-                "localField": "submitted_by",
-                "foreignField": "id",
-                "as": "submitter_info"
-            }
-        })
-        
-        # Unwind (preserve nulls just in case, though ideally shouldn't happen)
-        pipeline.append({"$unwind": {"path": "$submitter_info", "preserveNullAndEmptyArrays": True}})
-        
-        # Filter based on division request
-        if division == "Monitoring":
-            pipeline.append({"$match": {"submitter_info.division": "Monitoring"}})
-        elif division == "Infra & Fiberzone":
-            pipeline.append({"$match": {"submitter_info.division": {"$in": ["Infra", "Fiberzone"]}}})
-        elif division == "TS & Apps":
-            pipeline.append({"$match": {"submitter_info.division": {"$in": ["TS", "Apps"]}}})
-            
-        # Cleanup - remove the joined info to keep response clean
-        pipeline.append({"$project": {"submitter_info": 0}})
-
-    # Exclude file_data and _id
-    pipeline.append({"$project": {"file_data": 0, "_id": 0}})
-
-    # Execute aggregation
-    reports = await db.reports.aggregate(pipeline).to_list(1000)
-    return reports
+    # Division filters match the submitter division stamped on each report
+    if division in DIVISION_GROUPS.values():
+        query["submitter_division_group"] = division
+    elif division in DIVISION_GROUPS:
+        query["submitter_division"] = division
+    
+    # Compatibility: the old unpaginated list with full documents
+    if legacy:
+        reports = await db.reports.find(query, {"_id": 0, "file_data": 0}).to_list(1000)
+        return reports
+    
+    if status and status != "all":
+        query["status"] = status
+    elif exclude_final:
+        query["status"] = {"$ne": "Final"}
+    if category_id and category_id != "all":
+        query["category_id"] = category_id
+    if submitted_by and submitted_by != "all":
+        query["submitted_by"] = submitted_by
+    start_date = parse_iso_param(start, "start")
+    end_date = parse_iso_param(end, "end")
+    if start_date or end_date:
+        add_date_range(query, "created_at", start_date, end_date)
+    if q and q.strip():
+        # Case-insensitive substring search; unindexed, so it scans what the other filters leave
+        pattern = {"$regex": re.escape(q.strip()), "$options": "i"}
+        query["$or"] = [{field: pattern} for field in REPORT_SEARCH_FIELDS]
+    
+    sort = REPORT_SORT if order != "oldest" else [(field, ASCENDING) for field, _ in REPORT_SORT]
+    return await paginate(db.reports, query, sort, cursor, limit, REPORT_LIST_PROJECTION)
 
 @api_router.get("/reports/{report_id}")
 async def get_report(report_id: str, current_user: dict = Depends(get_current_user)):
     report = await db.reports.find_one({"id": report_id}, {"_id": 0})
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return report
+    return await attach_first_comment_page("report", report)
 
 @api_router.get("/reports/statistics/user-counts")
 async def get_user_report_statistics(
-    month: int,
     year: int,
+    month: Optional[int] = None,
     category_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    # Calculate date range
-    try:
-        start_date = datetime(year, month, 1, tzinfo=timezone.utc)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1, tzinfo=timezone.utc) - timedelta(microseconds=1)
-        else:
-            end_date = datetime(year, month + 1, 1, tzinfo=timezone.utc) - timedelta(microseconds=1)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid month or year")
-    
-    query = {
-        "created_at": {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
-    }
-    
-    if category_id and category_id != "all":
-        query["category_id"] = category_id
-        
-    # Aggregate
-    pipeline = [
-        {"$match": query},
-        {"$group": {
-            "_id": "$submitted_by_name",
-            "count": {"$sum": 1}
-        }},
-        {"$project": {
-            "name": "$_id",
-            "value": "$count",
-            "_id": 0
-        }}
-    ]
-    
-    stats = await db.reports.aggregate(pipeline).to_list(None)
-    return stats
+    # Omitting month returns the year-to-date totals
+    return await read_report_stats("submitter", year, month, category_id)
 
 @api_router.get("/reports/statistics/site-counts")
 async def get_site_report_statistics(
-    month: int,
     year: int,
+    month: Optional[int] = None,
     category_id: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    # Calculate date range
-    try:
-        start_date = datetime(year, month, 1, tzinfo=timezone.utc)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1, tzinfo=timezone.utc) - timedelta(microseconds=1)
-        else:
-            end_date = datetime(year, month + 1, 1, tzinfo=timezone.utc) - timedelta(microseconds=1)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid month or year")
-    
-    query = {
-        "created_at": {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
-    }
-    
-    if category_id and category_id != "all":
-        query["category_id"] = category_id
-        
-    # Aggregate by site_name
-    pipeline = [
-        {"$match": query},
-        {"$group": {
-            "_id": "$site_name",
-            "count": {"$sum": 1}
-        }},
-        {"$match": {"_id": {"$ne": None, "$ne": ""}}}, # Filter out reports without site name
-        {"$project": {
-            "name": "$_id",
-            "value": "$count",
-            "_id": 0
-        }}
-    ]
-    
-    stats = await db.reports.aggregate(pipeline).to_list(None)
-    return stats
+    return await read_report_stats("site", year, month, category_id)
 
 @api_router.post("/reports/approve")
 async def approve_report(approval: ApprovalAction, current_user: dict = Depends(get_current_user)):
-    report = await db.reports.find_one({"id": approval.report_id}, {"_id": 0})
+    report = await db.reports.find_one({"id": approval.report_id}, {"_id": 0, "file_data": 0})
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    # PHASE 3: Non-linear approval logic
-    # VP can approve at any stage
-    # Manager can approve if status is "Pending SPV" or "Pending Manager" AND it's their division
-    # SPV can only approve if they are the current approver
-    can_approve = False
-    if current_user["role"] == "VP":
-        can_approve = True
-    elif current_user["role"] == "Manager" and report["status"] in ["Pending SPV", "Pending Manager"]:
-        # NEW: Check if Manager's division matches the report's division hierarchy
-        submitter = await db.users.find_one({"id": report["submitted_by"]}, {"_id": 0})
-        if submitter:
-            submitter_division = submitter.get("division")
-            manager_division = current_user.get("division")
-            
-            # Determine the correct manager division for the submitter
-            correct_manager_division = submitter_division
-            if submitter_division == "Apps":
-                correct_manager_division = "TS"
-            elif submitter_division == "Fiberzone":
-                correct_manager_division = "Infra"
-            
-            # Only allow if manager's division matches the correct hierarchy
-            if manager_division == correct_manager_division:
-                can_approve = True
-    elif report["current_approver"] == current_user["id"]:
-        can_approve = True
-    
-    if not can_approve:
+    if not await can_review_report(report, current_user):
         raise HTTPException(status_code=403, detail="You are not authorized to approve this report")
     
     # PHASE 3: Rename reject to revisi
     if approval.action == "revisi":
         if not approval.comment:
             raise HTTPException(status_code=400, detail="Comment is required for revisi")
+        if report["status"] == "Revisi":
+            raise HTTPException(status_code=400, detail="Report is already awaiting revision")
         
-        await db.reports.update_one(
-            {"id": approval.report_id},
-            {
-                "$set": {
-                    "status": "Revisi",
-                    "rejection_comment": approval.comment,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
-        )
+        await apply_report_transition(report, {"status": "Revisi", "rejection_comment": approval.comment})
         
         await create_notification(
             user_id=report["submitted_by"],
@@ -1661,53 +3085,12 @@ async def approve_report(approval: ApprovalAction, current_user: dict = Depends(
         
         return {"message": "Report sent for revision"}
     
-    # PHASE 3: Non-linear approval - determine next status based on current role
-    new_status = ""
-    new_approver = None
-    
-    # If VP approves, skip all intermediate stages and go to Final
-    if current_user["role"] == "VP":
-        new_status = "Final"
-        new_approver = None
-    # If Manager approves and current status is "Pending SPV", skip to VP
-    elif current_user["role"] == "Manager" and report["status"] == "Pending SPV":
-        new_status = "Pending VP"
-        vp = await db.users.find_one({"role": "VP"}, {"_id": 0})
-        new_approver = vp["id"] if vp else None
-    # Normal flow for SPV
-    elif report["status"] == "Pending SPV":
-        new_status = "Pending Manager"
-        submitter = await db.users.find_one({"id": report["submitted_by"]}, {"_id": 0})
-        
-        # NEW: Route Apps to TS Manager, Fiberzone to Infra Manager
-        target_division = submitter.get("division")
-        if target_division == "Apps":
-            target_division = "TS"
-        elif target_division == "Fiberzone":
-            target_division = "Infra"
-            
-        manager = await db.users.find_one({"role": "Manager", "division": target_division}, {"_id": 0})
-        new_approver = manager["id"] if manager else None
-    # Normal flow for Manager
-    elif report["status"] == "Pending Manager":
-        new_status = "Pending VP"
-        vp = await db.users.find_one({"role": "VP"}, {"_id": 0})
-        new_approver = vp["id"] if vp else None
-    # Normal flow for VP
-    elif report["status"] == "Pending VP":
-        new_status = "Final"
-        new_approver = None
-    
-    await db.reports.update_one(
-        {"id": approval.report_id},
-        {
-            "$set": {
-                "status": new_status,
-                "current_approver": new_approver,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-        }
-    )
+    new_status = next_report_status(report, current_user)
+    if new_status is None:
+        raise HTTPException(status_code=400, detail=f"A report in status '{report['status']}' cannot be approved")
+    new_approver = await approver_for_status(new_status, await report_submitter_division(report))
+    
+    await apply_report_transition(report, {"status": new_status, "current_approver": new_approver})
     
     if new_status == "Final":
         await create_notification(
@@ -1736,6 +3119,7 @@ async def edit_report(
     description: str = Form(None),
     site_id: str = Form(None),
     ticket_id: str = Form(None),
+    category_id: str = Form(None),
     file: Optional[UploadFile] = File(None),
     current_user: dict = Depends(get_current_user)
 ):
@@ -1764,97 +3148,59 @@ async def edit_report(
             update_dict["site_name"] = None
     if ticket_id is not None:
         update_dict["ticket_id"] = ticket_id if ticket_id != "" else None
+    if category_id is not None:
+        update_dict["category_id"] = category_id if category_id != "" else None
+        update_dict["category_name"] = None
+        if update_dict["category_id"]:
+            category = await db.activity_categories.find_one({"id": update_dict["category_id"]}, {"_id": 0})
+            if category:
+                update_dict["category_name"] = category["name"]
 
     # Handle file update
     if file:
-        # Determine folder name (use current site or new site if changed)
-        # Note: ticket_id/site_id/title/desc might be updated above independently
-        # We need the EFFECTIVE site_id for the file organization
-        effective_site_id = site_id if site_id is not None else report.get("site_id")
-        
-        folder_name = "Unassigned"
-        if effective_site_id:
-             # If site_id came from form (site_id is not None), we might need to fetch it
-             # If it came from DB record, we might need to fetch it too properly
-             site = await db.sites.find_one({"id": effective_site_id}, {"_id": 0})
-             if site:
-                 folder_name = "".join(c for c in site["name"] if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
-        
-        # Prepare file storage for report
-        reports_dir = UPLOAD_DIR / "reports" / folder_name
-        reports_dir.mkdir(parents=True, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"report_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
-        file_path = reports_dir / unique_filename
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
+        # Save file, stored once per distinct content
+        blob = await store_blob(file, UPLOAD_LIMITS["report"])
         update_dict["file_name"] = file.filename
-        update_dict["file_url"] = f"/uploads/reports/{folder_name}/{unique_filename}"
+        update_dict["file_url"] = blob["url"]
         update_dict["file_data"] = None # Clear old data if exists
     
     # NEW: If status is 'Revisi', reset to start of approval flow
+    first_approver = None
     if report["status"] == "Revisi":
-        # Get the division from the report creator (user who submitted the report)
-        report_creator = await db.users.find_one({"id": report["submitted_by"]}, {"_id": 0})
-        if not report_creator:
-            raise HTTPException(status_code=404, detail="Report creator not found")
-        
-        creator_division = report_creator.get("division")
-        
-        # Determine first approver (similar to create_report logic)
-        first_approver = None
-        current_approver_role = "SPV"
-        
-        # Route Apps to TS, Fiberzone to Infra
-        target_division = creator_division
-        if target_division == "Apps":
-            target_division = "TS"
-        elif target_division == "Fiberzone":
-            target_division = "Infra"
-        
-        # Find SPV of the target division
-        spv = await db.users.find_one({"role": "SPV", "division": target_division})
-        if spv:
-            first_approver = spv["id"]
-        else:
-            # Fallback to Manager
-            current_approver_role = "Manager"
-            manager = await db.users.find_one({"role": "Manager", "division": target_division})
-            if manager:
-                first_approver = manager["id"]
-            else:
-                 # Fallback to VP
-                current_approver_role = "VP"
-                vp = await db.users.find_one({"role": "VP"})
-                if vp:
-                    first_approver = vp["id"]
+        # First approver in the chain, falling back from SPV to Manager to VP
+        current_approver_role, first_approver = await approver_routing.first_approver(
+            await report_submitter_division(report), APPROVER_ROLES
+        )
         
         if first_approver:
             update_dict["status"] = f"Pending {current_approver_role}"
             update_dict["current_approver"] = first_approver
             update_dict["rejection_comment"] = None # Clear rejection comment
-            
-            # Notify the new approver
-            await create_notification(
-                user_id=first_approver,
-                title="Resubmitted Report Needs Approval",
-                message=f"Resubmitted report '{report['title']}' is awaiting your approval",
-                notification_type="report",
-                related_id=report["id"]
-            )
 
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     update_dict["version"] = report["version"] + 1
     
-    await db.reports.update_one(
-        {"id": report_id},
-        {"$set": update_dict}
-    )
+    try:
+        await apply_report_transition(report, update_dict)
+    except HTTPException:
+        # Lost to a concurrent approval or edit: drop the file uploaded for this attempt
+        if file:
+            await release_blob(update_dict["file_url"])
+        raise
+    await move_report_rollup(report, {**report, **update_dict})
+    
+    if first_approver:
+        # Notify the new approver
+        await create_notification(
+            user_id=first_approver,
+            title="Resubmitted Report Needs Approval",
+            message=f"Resubmitted report '{report['title']}' is awaiting your approval",
+            notification_type="report",
+            related_id=report["id"]
+        )
+    
+    # The replaced file loses this report's reference
+    if file:
+        await release_blob(report.get("file_url"))
     
     return {"message": "Report updated successfully"}
 
@@ -1880,7 +3226,12 @@ async def delete_report(report_id: str, current_user: dict = Depends(get_current
         {"$unset": {"linked_report_id": ""}}
     )
     
-    await db.reports.delete_one({"id": report_id})
+    result = await db.reports.delete_one({"id": report_id})
+    if result.deleted_count:
+        await apply_report_rollup(report, -1)
+        await db.comments.delete_many({"parent_type": "report", "parent_id": report_id})
+        # Only the request that actually deleted the report drops its file reference
+        await release_blob(report.get("file_url"))
     return {"message": "Report deleted successfully"}
 
 @api_router.post("/reports/{report_id}/comments")
@@ -1889,19 +3240,7 @@ async def add_report_comment(report_id: str, comment_data: CommentCreate, curren
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    comment = Comment(
-        user_id=current_user["id"],
-        user_name=current_user["username"],
-        text=comment_data.text
-    )
-    
-    comment_doc = comment.model_dump()
-    comment_doc['created_at'] = comment_doc['created_at'].isoformat()
-    
-    await db.reports.update_one(
-        {"id": report_id},
-        {"$push": {"comments": comment_doc}}
-    )
+    await add_comment("report", report_id, current_user, comment_data.text)
     
     # Notify report creator if someone else comments
     if report["submitted_by"] != current_user["id"]:
@@ -1915,6 +3254,16 @@ async def add_report_comment(report_id: str, comment_data: CommentCreate, curren
         
     return {"message": "Comment added successfully"}
 
+@api_router.get("/reports/{report_id}/comments")
+async def get_report_comments(
+    report_id: str,
+    cursor: Optional[str] = None,
+    limit: int = COMMENT_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """A report's comments a page at a time, newest page first, each page oldest first"""
+    return await comment_page("report", report_id, cursor, limit)
+
 # ============ TICKET ENDPOINTS (V3) - UPDATED ============
 
 @api_router.post("/tickets")
@@ -1939,14 +3288,12 @@ async def create_ticket(ticket_data: TicketCreate, current_user: dict = Depends(
     )
     
     doc = ticket.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
     await db.tickets.insert_one(doc)
     
-    manager = await db.users.find_one({"role": "Manager", "division": ticket_data.assigned_to_division}, {"_id": 0})
-    if manager:
+    manager_id = await approver_routing.get_id("Manager", ticket_data.assigned_to_division)
+    if manager_id:
         await create_notification(
-            user_id=manager["id"],
+            user_id=manager_id,
             title="New Ticket Assigned",
             message=f"New {ticket_data.priority} priority ticket: {ticket_data.title}",
             notification_type="ticket",
@@ -1962,7 +3309,7 @@ async def get_tickets(site_id: Optional[str] = None, current_user: dict = Depend
     if site_id:
         query["site_id"] = site_id
     
-    tickets = await db.tickets.find(query, {"_id": 0}).to_list(1000)
+    tickets = await db.tickets.find(query, {"_id": 0, "comments": 0}).to_list(1000)
     return tickets
 
 @api_router.get("/tickets/list/all")
@@ -1976,12 +3323,12 @@ async def get_ticket(ticket_id: str, current_user: dict = Depends(get_current_us
     ticket = await db.tickets.find_one({"id": ticket_id}, {"_id": 0})
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    return ticket
+    return await attach_first_comment_page("ticket", ticket)
 
 @api_router.patch("/tickets/{ticket_id}")
 async def update_ticket(ticket_id: str, update_data: TicketUpdate, current_user: dict = Depends(get_current_user)):
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = datetime.now(timezone.utc)
     
     await db.tickets.update_one(
         {"id": ticket_id},
@@ -2018,7 +3365,7 @@ async def edit_ticket(ticket_id: str, edit_data: TicketEdit, current_user: dict
         else:
             update_dict["site_name"] = None
     
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = datetime.now(timezone.utc)
     
     await db.tickets.update_one(
         {"id": ticket_id},
@@ -2040,28 +3387,30 @@ async def close_ticket(ticket_id: str, current_user: dict = Depends(get_current_
     
     await db.tickets.update_one(
         {"id": ticket_id},
-        {"$set": {"status": "Closed", "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": "Closed", "updated_at": datetime.now(timezone.utc)}}
     )
     
     return {"message": "Ticket closed successfully"}
 
 @api_router.post("/tickets/{ticket_id}/comments")
 async def add_ticket_comment(ticket_id: str, comment_data: TicketComment, current_user: dict = Depends(get_current_user)):
-    comment = {
-        "id": str(uuid.uuid4()),
-        "user_id": current_user["id"],
-        "user_name": current_user["username"],
-        "comment": comment_data.comment,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
+    if not await db.tickets.find_one({"id": ticket_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Ticket not found")
     
-    await db.tickets.update_one(
-        {"id": ticket_id},
-        {"$push": {"comments": comment}}
-    )
+    await add_comment("ticket", ticket_id, current_user, comment_data.comment)
     
     return {"message": "Comment added successfully"}
 
+@api_router.get("/tickets/{ticket_id}/comments")
+async def get_ticket_comments(
+    ticket_id: str,
+    cursor: Optional[str] = None,
+    limit: int = COMMENT_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """A ticket's comments a page at a time, newest page first, each page oldest first"""
+    return await comment_page("ticket", ticket_id, cursor, limit)
+
 @api_router.post("/tickets/{ticket_id}/link-report/{report_id}")
 async def link_report_to_ticket(ticket_id: str, report_id: str, current_user: dict = Depends(get_current_user)):
     await db.tickets.update_one(
@@ -2081,83 +3430,249 @@ async def get_notifications(current_user: dict = Depends(get_current_user)):
     ).sort("created_at", -1).to_list(100)
     return notifications
 
+@api_router.get("/notifications/stream")
+async def stream_notifications(request: Request, token: str):
+    # EventSource cannot send an Authorization header, so the JWT comes in the query string
+    current_user = await authenticate_token(token)
+    queue = notification_hub.subscribe(current_user["id"])
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is None:
+                    break
+                yield f"event: notification\ndata: {payload}\n\n"
+        finally:
+            notification_hub.unsubscribe(current_user["id"], queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.post("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
-    await db.notifications.update_one(
-        {"id": notification_id, "user_id": current_user["id"]},
+    result = await db.notifications.update_one(
+        {"id": notification_id, "user_id": current_user["id"], "read": False},
         {"$set": {"read": True}}
     )
+    if result.modified_count:
+        await db.notification_counters.update_one(
+            {"user_id": current_user["id"], "unread": {"$gt": 0}},
+            {"$inc": {"unread": -1}}
+        )
     return {"message": "Notification marked as read"}
 
 @api_router.get("/notifications/unread-count")
 async def get_unread_count(current_user: dict = Depends(get_current_user)):
+    counter = await db.notification_counters.find_one({"user_id": current_user["id"]}, {"_id": 0, "unread": 1, "seeded": 1})
+    if counter is not None and counter.get("seeded"):
+        return {"count": counter.get("unread", 0)}
+    
+    # First read for this user: seed the counter from their history, once, in a single
+    # guarded update that replaces whatever increments created the document with
     count = await db.notifications.count_documents({"user_id": current_user["id"], "read": False})
-    return {"count": count}
+    try:
+        seeded = await db.notification_counters.find_one_and_update(
+            {"user_id": current_user["id"], "seeded": {"$ne": True}},
+            {"$set": {"unread": count, "seeded": True}},
+            projection={"_id": 0, "unread": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another request seeded it first
+        seeded = await db.notification_counters.find_one({"user_id": current_user["id"]}, {"_id": 0, "unread": 1})
+    return {"count": seeded.get("unread", 0) if seeded else count}
+
+# ============ METRICS ENDPOINT ============
+
+@api_router.get("/admin/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    # Only SuperUser can view process metrics
+    if current_user["role"] != "SuperUser":
+        raise HTTPException(status_code=403, detail="Only SuperUser can view metrics")
+    
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "notification_queue": notification_queue.stats(),
+        "notification_hub": notification_hub.stats(),
+        "image_variant_worker": image_variant_worker.stats(),
+        "approver_routing": approver_routing.stats(),
+        "reference_cache": reference_cache.stats()
+    }
 
 # ============ DASHBOARD ENDPOINT ============
 
+async def _timed_section(name: str, query, timings: list):
+    started = time.perf_counter()
+    try:
+        return await query
+    finally:
+        timings.append(f"{name};dur={(time.perf_counter() - started) * 1000:.1f}")
+
+async def _no_section():
+    return []
+
 @api_router.get("/dashboard")
-async def get_dashboard(current_user: dict = Depends(get_current_user)):
-    today = datetime.now(timezone.utc)
-    today_str = today.isoformat()
-    
-    schedules_today = await db.schedules.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).to_list(100)
-    
-    schedules_today = [
-        s for s in schedules_today 
-        if datetime.fromisoformat(s["start_date"]).date() <= today.date() <= datetime.fromisoformat(s["end_date"]).date()
-    ]
-    
-    pending_approvals = []
-    if current_user["role"] in ["SPV", "Manager", "VP"]:
-        pending_approvals = await db.reports.find(
+async def get_dashboard(response: Response, current_user: dict = Depends(get_current_user)):
+    started = time.perf_counter()
+    role = current_user["role"]
+    division = current_user.get("division")
+    
+    # Schedules spanning today: starting by the end of the day, ending after its start
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    today_end = today_start + timedelta(days=1) - timedelta(microseconds=1)
+    schedules_query = add_date_range({"user_id": current_user["id"]}, "start_date", end=today_end)
+    add_date_range(schedules_query, "end_date", start=today_start)
+    
+    async def schedules_today():
+        schedules = await db.schedules.find(schedules_query, {"_id": 0}).sort(SCHEDULE_SORT).to_list(100)
+        return [wall_clock(s) for s in schedules]
+    
+    async def pending_approvals():
+        return await db.reports.find(
             {"current_approver": current_user["id"]},
-            {"_id": 0, "file_data": 0}
-        ).to_list(100)
+            REPORT_LIST_PROJECTION
+        ).sort(REPORT_SORT).to_list(100)
     
-    open_tickets = []
-    if current_user["role"] in ["Manager", "VP"]:
+    async def open_tickets():
         query = {"status": {"$ne": "Closed"}}
-        if current_user["role"] == "Manager":
-            query["assigned_to_division"] = current_user.get("division")
-        open_tickets = await db.tickets.find(query, {"_id": 0}).to_list(100)
+        if role == "Manager":
+            query["assigned_to_division"] = division
+        return await db.tickets.find(query, {"_id": 0, "comments": 0}).to_list(100)
     
-    # NEW: Add pending account approvals and shift change requests
-    pending_accounts = []
-    pending_shift_changes = []
-    
-    if current_user["role"] in ["Manager", "VP"]:
+    async def pending_accounts():
         query = {"account_status": "pending"}
-        if current_user["role"] == "Manager":
-            query["division"] = current_user.get("division")
+        if role == "Manager":
+            query["division"] = division
             query["role"] = {"$ne": "Manager"}  # Consistency with get_pending_accounts
-        elif current_user["role"] == "VP":
+        elif role == "VP":
             query["role"] = "Manager"
-            
-        pending_accounts = await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(100)
-
-        
-        # Shift change requests
+        return await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(100)
+    
+    async def pending_shift_changes():
         query = {"status": "pending"}
-        if current_user["role"] == "Manager":
-            schedules = await db.schedules.find({"division": current_user.get("division")}, {"_id": 0}).to_list(10000)
-            schedule_ids = [s["id"] for s in schedules]
-            query["schedule_id"] = {"$in": schedule_ids}
-        pending_shift_changes = await db.shift_change_requests.find(query, {"_id": 0}).to_list(100)
+        if role == "Manager":
+            query["division"] = division
+        requests = await db.shift_change_requests.find(query, {"_id": 0}).sort("created_at", DESCENDING).to_list(100)
+        return [wall_clock(r) for r in requests]
     
-    return {
+    sections = {
         "schedules_today": schedules_today,
-        "pending_approvals": pending_approvals,
-        "open_tickets": open_tickets,
-        "pending_accounts": pending_accounts,
-        "pending_shift_changes": pending_shift_changes
+        "pending_approvals": pending_approvals if role in ["SPV", "Manager", "VP"] else None,
+        "open_tickets": open_tickets if role in ["Manager", "VP"] else None,
+        "pending_accounts": pending_accounts if role in ["Manager", "VP"] else None,
+        "pending_shift_changes": pending_shift_changes if role in ["Manager", "VP"] else None,
     }
+    timings = []
+    results = await asyncio.gather(*(
+        _timed_section(name, section(), timings) if section else _no_section()
+        for name, section in sections.items()
+    ))
+    
+    timings.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+    return dict(zip(sections, results))
 
 app.include_router(api_router)
 
+# ============ UPLOAD SERVING ============
+
+# (path, mtime, size) -> sha256 for files whose name doesn't carry their hash
+_upload_etags = OrderedDict()
+
+async def _upload_etag(path: Path, relative_path: str, stat) -> str:
+    if relative_path.startswith("blobs/"):
+        return f'"{path.name.split(".")[0]}"'
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    sha256 = _upload_etags.get(key)
+    if sha256 is None:
+        sha256, _ = await asyncio.to_thread(_hash_file, path)
+        _upload_etags[key] = sha256
+        while len(_upload_etags) > UPLOAD_ETAG_CACHE_SIZE:
+            _upload_etags.popitem(last=False)
+    else:
+        _upload_etags.move_to_end(key)
+    return f'"{sha256}"'
+
+def _parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=start-end' range; None means serve the whole file"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        # Suffix range: the last N bytes
+        length = int(match.group(2))
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    if start >= size or end < start:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+async def _iter_file_range(path: Path, start: int, length: int):
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+@app.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_upload(file_path: str, request: Request):
+    # Uploads moved into the blob store keep resolving by their old path
+    path = await upload_path_for_url(f"/uploads/{file_path}")
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    relative_path = path.relative_to(UPLOAD_DIR.resolve()).as_posix()
+    stat = await asyncio.to_thread(path.stat)
+    etag = await _upload_etag(path, relative_path, stat)
+    immutable = relative_path.startswith(("blobs/", "profiles/"))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = _parse_byte_range(range_header, stat.st_size)
+    
+    if byte_range is None:
+        return FileResponse(path, headers=headers, stat_result=stat)
+    
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(length)
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_file_range(path, start, length), status_code=206, headers=headers, media_type=media_type)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -2174,7 +3689,157 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await notification_queue.stop()
     client.close()
+    password_hasher.shutdown()
+
+@app.on_event("startup")
+async def start_notification_queue():
+    notification_queue.start()
+
+@app.on_event("startup")
+async def start_image_variant_worker():
+    image_variant_worker.start()
+
+@app.on_event("shutdown")
+async def stop_image_variant_worker():
+    await image_variant_worker.stop()
+
+background_tasks = []
+
+@app.on_event("startup")
+async def start_background_jobs():
+    background_tasks.append(asyncio.create_task(reconcile_unread_counters_periodically()))
+    background_tasks.append(asyncio.create_task(migrate_profile_photos()))
+    background_tasks.append(asyncio.create_task(seed_report_stats()))
+    background_tasks.append(asyncio.create_task(migrate_date_fields()))
+    background_tasks.append(asyncio.create_task(backfill_report_divisions()))
+    background_tasks.append(asyncio.create_task(backfill_shift_change_divisions()))
+    background_tasks.append(asyncio.create_task(migrate_progress_updates()))
+    background_tasks.append(asyncio.create_task(migrate_comments()))
+    background_tasks.append(asyncio.create_task(reference_cache.warm()))
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for task in background_tasks:
+        task.cancel()
+
+# ============ INDEXES ============
+
+# Every collection's indexes, keyed to the filters and sorts the endpoints use.
+# Applied idempotently on startup; create_index is a no-op when the index exists.
+# Indexes on these collections that are not listed here are only logged at startup;
+# `manage.py prune-indexes` drops them.
+INDEXES = {
+    "users": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("role", ASCENDING), ("division", ASCENDING)], {}),
+        ([("account_status", ASCENDING), ("division", ASCENDING), ("role", ASCENDING)], {}),
+    ],
+    "sites": [
+        ([("id", ASCENDING)], {"unique": True}),
+    ],
+    "activity_categories": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("name", ASCENDING)], {}),
+    ],
+    "schedules": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("start_date", ASCENDING), ("id", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("start_date", ASCENDING), ("id", ASCENDING)], {}),
+        ([("division", ASCENDING), ("start_date", ASCENDING), ("id", ASCENDING)], {}),
+        ([("site_id", ASCENDING), ("start_date", ASCENDING), ("id", ASCENDING)], {}),
+        ([("category_id", ASCENDING), ("start_date", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "activities": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("schedule_id", ASCENDING), ("created_at", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("division", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("created_at", DESCENDING)], {}),
+    ],
+    "comments": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("parent_type", ASCENDING), ("parent_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "progress_updates": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("schedule_id", ASCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)], {}),
+        ([("activity_id", ASCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)], {}),
+        ([("image_url", ASCENDING)], {}),
+    ],
+    "shift_change_requests": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("requested_by", ASCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("division", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("schedule_id", ASCENDING)], {}),
+    ],
+    "reports": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("current_approver", ASCENDING)], {}),
+        ([("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("submitted_by", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("site_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("category_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("submitter_division_group", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("submitter_division_group", ASCENDING), ("site_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("submitter_division", ASCENDING), ("site_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "tickets": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("site_id", ASCENDING)], {}),
+        ([("linked_report_id", ASCENDING)], {}),
+        ([("status", ASCENDING), ("assigned_to_division", ASCENDING)], {}),
+    ],
+    "file_blobs": [
+        ([("sha256", ASCENDING)], {"unique": True}),
+    ],
+    "file_aliases": [
+        ([("path", ASCENDING)], {"unique": True}),
+        ([("sha256", ASCENDING)], {}),
+    ],
+    "notification_counters": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "report_stats": [
+        ([("year", ASCENDING), ("dimension", ASCENDING), ("month", ASCENDING), ("category_id", ASCENDING), ("key", ASCENDING)], {"unique": True}),
+    ],
+    "notifications": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("read", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+}
+
+def _index_key(keys) -> tuple:
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys)
+
+@app.on_event("startup")
+async def ensure_indexes():
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for keys, options in indexes:
+            try:
+                await collection.create_index(keys, **options)
+            except OperationFailure as e:
+                # Don't block startup on bad legacy data (e.g. duplicate emails breaking a unique index)
+                logger.error(f"Failed to create index {keys} on {collection_name}: {e}")
+    
+    for collection_name, names in (await undeclared_indexes()).items():
+        logger.warning(f"Undeclared indexes on {collection_name}: {', '.join(names)} (drop with manage.py prune-indexes)")
+
+async def undeclared_indexes() -> dict:
+    """Index names on manifest collections whose keys are not in INDEXES, per collection"""
+    undeclared = {}
+    for collection_name, indexes in INDEXES.items():
+        declared = {_index_key(keys) for keys, _ in indexes}
+        for name, info in (await db[collection_name].index_information()).items():
+            if name != "_id_" and _index_key(info["key"]) not in declared:
+                undeclared.setdefault(collection_name, []).append(name)
+    return undeclared
 
 @app.on_event("startup")
 async def create_seed_data():
@@ -2206,13 +3871,12 @@ async def create_seed_data():
         user = User(
             username=user_data.username,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await get_password_hash(user_data.password),
             role=user_data.role,
             division=user_data.division,
             account_status="approved"
         )
         doc = user.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         await db.users.insert_one(doc)
     
     # Create sample sites
@@ -2232,7 +3896,6 @@ async def create_seed_data():
                 created_by=vp["id"]
             )
             doc = site.model_dump()
-            doc['created_at'] = doc['created_at'].isoformat()
             await db.sites.insert_one(doc)
     
     # Create default activity categories
@@ -2252,9 +3915,11 @@ async def create_seed_data():
             created_by=vp["id"] if vp else "system"
         )
         doc = category.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         await db.activity_categories.insert_one(doc)
     
+    approver_routing.invalidate()
+    for name in REFERENCE_DATA_LOADERS:
+        reference_cache.invalidate(name)
     logger.info("Seed data created successfully!")
     logger.info("Sample login credentials: vp@company.com / password123")
 
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# server.py reads these at import time; no connection is made until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "flux_test")
+os.environ.setdefault("NOTIFICATION_QUEUE_MODE", "sync")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,295 @@
+"""A small in-memory stand-in for the Motor collections the tests touch.
+
+Supports the filter and update operators server.py uses and counts round trips
+per collection, so tests can assert on query counts as well as results.
+"""
+import copy
+import re
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _comparable(value):
+    # Stored dates may be naive (as pymongo stores them) or aware
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _match_operator(value, operator: str, operand, options: str = "") -> bool:
+    if operator == "$regex":
+        flags = re.IGNORECASE if "i" in options else 0
+        return isinstance(value, str) and re.search(operand, value, flags) is not None
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if operator == "$ne":
+        return (None if value is _MISSING else value) != operand
+    if operator == "$in":
+        return (None if value is _MISSING else value) in operand
+    if operator == "$nin":
+        return (None if value is _MISSING else value) not in operand
+    if operator == "$type":
+        return operand == "string" and isinstance(value, str)
+    if value is _MISSING or value is None:
+        return False
+    value, operand = _comparable(value), _comparable(operand)
+    return {
+        "$gt": lambda: value > operand,
+        "$gte": lambda: value >= operand,
+        "$lt": lambda: value < operand,
+        "$lte": lambda: value <= operand,
+    }[operator]()
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            options = condition.get("$options", "")
+            operators = {op: operand for op, operand in condition.items() if op != "$options"}
+            if not all(_match_operator(_get(doc, key), op, operand, options) for op, operand in operators.items()):
+                return False
+        else:
+            value = _get(doc, key)
+            if (None if value is _MISSING else value) != condition:
+                return False
+    return True
+
+
+def _project(doc: dict, projection) -> dict:
+    doc = copy.deepcopy(doc)
+    if projection:
+        include = [k for k, v in projection.items() if v and k != "_id"]
+        if include:
+            doc = {k: v for k, v in doc.items() if k in include}
+        for k, v in projection.items():
+            if not v:
+                doc.pop(k, None)
+    doc.pop("_id", None)
+    return doc
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    for field, value in update.get("$set", {}).items():
+        doc[field] = copy.deepcopy(value)
+    if inserting:
+        for field, value in update.get("$setOnInsert", {}).items():
+            doc[field] = copy.deepcopy(value)
+    for field, value in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + value
+    for field, value in update.get("$max", {}).items():
+        if field not in doc or _comparable(value) > _comparable(doc[field]):
+            doc[field] = value
+    for field, value in update.get("$push", {}).items():
+        doc.setdefault(field, []).append(copy.deepcopy(value))
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+
+
+def _group(docs: list, spec: dict) -> list:
+    groups = {}
+    for doc in docs:
+        key = _get(doc, spec["_id"][1:])
+        group = groups.setdefault(key, {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, expression), = accumulator.items()
+            value = doc if expression == "$$ROOT" else (
+                _get(doc, expression[1:]) if isinstance(expression, str) else expression
+            )
+            if operator == "$sum":
+                group[field] = group.get(field, 0) + value
+            elif operator == "$last" or (operator == "$first" and field not in group):
+                group[field] = copy.deepcopy(value)
+    return list(groups.values())
+
+
+class FakeResult:
+    def __init__(self, matched: int = 0, modified: int = 0, deleted: int = 0, upserted_id=None):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.deleted_count = deleted
+        self.upserted_id = upserted_id
+
+
+class FakeCursor:
+    def __init__(self, docs: list):
+        self._docs = docs
+
+    def sort(self, key, direction=None):
+        keys = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: _comparable(d.get(field)), reverse=order == -1)
+        return self
+
+    def limit(self, n: int):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs=None, unique=None):
+        self.docs = [copy.deepcopy(d) for d in docs or []]
+        self.unique = unique
+        self.calls = 0
+
+    def _insert(self, doc: dict):
+        if self.unique and any(d.get(self.unique) == doc.get(self.unique) for d in self.docs):
+            raise DuplicateKeyError(f"duplicate {self.unique}")
+        self.docs.append(doc)
+
+    def _upsert_doc(self, query: dict, update: dict) -> dict:
+        doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return doc
+
+    def find(self, query=None, projection=None):
+        self.calls += 1
+        return FakeCursor([_project(d, projection) for d in self.docs if matches(d, query or {})])
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        self.calls += 1
+        docs = [d for d in self.docs if matches(d, query or {})]
+        if sort:
+            docs = FakeCursor(docs).sort(sort)._docs
+        return _project(docs[0], projection) if docs else None
+
+    async def count_documents(self, query):
+        self.calls += 1
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def distinct(self, field, query=None):
+        self.calls += 1
+        return list(dict.fromkeys(d[field] for d in self.docs if field in d and matches(d, query or {})))
+
+    async def insert_one(self, doc):
+        self.calls += 1
+        self._insert(copy.deepcopy(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        for doc in docs:
+            self._insert(copy.deepcopy(doc))
+
+    def _update(self, query, update, upsert=False, many=False) -> FakeResult:
+        matched = [d for d in self.docs if matches(d, query)]
+        if not many:
+            matched = matched[:1]
+        for doc in matched:
+            apply_update(doc, update)
+        if not matched and upsert:
+            return FakeResult(upserted_id=id(self._upsert_doc(query, update)))
+        return FakeResult(matched=len(matched), modified=len(matched))
+
+    async def update_one(self, query, update, upsert=False, array_filters=None):
+        self.calls += 1
+        return self._update(query, update, upsert)
+
+    async def update_many(self, query, update, upsert=False, array_filters=None):
+        self.calls += 1
+        return self._update(query, update, upsert, many=True)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=ReturnDocument.BEFORE, sort=None):
+        self.calls += 1
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                apply_update(doc, update)
+                return _project(doc if return_document == ReturnDocument.AFTER else before, projection)
+        if upsert:
+            doc = self._upsert_doc(query, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    def aggregate(self, pipeline):
+        self.calls += 1
+        docs = [copy.deepcopy(d) for d in self.docs]
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            if operator == "$match":
+                docs = [d for d in docs if matches(d, spec)]
+            elif operator == "$sort":
+                docs = FakeCursor(docs).sort(list(spec.items()))._docs
+            elif operator == "$group":
+                docs = _group(docs, spec)
+            elif operator == "$unset":
+                for d in docs:
+                    for path in [spec] if isinstance(spec, str) else spec:
+                        parent, _, field = path.rpartition(".")
+                        target = _get(d, parent) if parent else d
+                        if isinstance(target, dict):
+                            target.pop(field, None)
+            else:
+                raise NotImplementedError(operator)
+        return FakeCursor(docs)
+
+    async def delete_one(self, query):
+        self.calls += 1
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return FakeResult(deleted=1)
+        return FakeResult()
+
+    async def delete_many(self, query):
+        self.calls += 1
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+        return FakeResult(deleted=before - len(self.docs))
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls += 1
+        for operation in operations:
+            self._update(operation._filter, operation._doc, operation._upsert)
+
+
+class FakeDB:
+    """Collections are created on first access, like Mongo's"""
+
+    def __init__(self, **collections):
+        self._collections = {name: c if isinstance(c, FakeCollection) else FakeCollection(c) for name, c in collections.items()}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, FakeCollection())
+
+    __getitem__ = __getattr__
+
+    @property
+    def round_trips(self) -> int:
+        return sum(c.calls for c in self._collections.values())
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from fakes import FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def build_db(schedule_count: int) -> FakeDB:
+    now = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    schedules, activities, updates = [], [], []
+    for s in range(schedule_count):
+        schedules.append({"id": f"s{s}", "user_id": USER["id"], "title": "t", "start_date": now})
+        # Schedule 0 has no activity at all
+        for a in range(2 if s else 0):
+            activity_id = f"s{s}-a{a}"
+            activities.append({
+                "id": activity_id, "schedule_id": f"s{s}", "status": "Started" if a == 0 else "Finished",
+                "created_at": START + timedelta(hours=a),
+            })
+            for u in range(2):
+                # Interleave the two activities' updates in time
+                updates.append({
+                    "id": f"{activity_id}-u{u}", "schedule_id": f"s{s}", "activity_id": activity_id,
+                    "update_text": "x", "timestamp": START + timedelta(minutes=2 * u + a),
+                })
+    return FakeDB(schedules=schedules, activities=activities, progress_updates=updates)
+
+
+async def per_schedule_lookup(db, schedule_id: str):
+    """What each schedule used to cost: one query for its activities, one for its updates"""
+    activities = await db.activities.find({"schedule_id": schedule_id}, {"_id": 0}).sort("created_at", 1).to_list(None)
+    if not activities:
+        return None
+    latest = activities[-1]
+    updates = await db.progress_updates.find({"schedule_id": schedule_id}, {"_id": 0}).sort(server.PROGRESS_UPDATE_SORT).to_list(None)
+    latest["progress_updates"] = [u for u in updates if u["activity_id"] == latest["id"]]
+    return {"latest": latest, "progress_updates": updates}
+
+
+def test_batched_lookup_matches_the_per_schedule_lookups(monkeypatch):
+    fake_db = build_db(5)
+    monkeypatch.setattr(server, "db", fake_db)
+    ids = [f"s{s}" for s in range(5)]
+
+    batched = asyncio.run(server.collect_schedule_activity(ids))
+
+    for schedule_id in ids:
+        expected = asyncio.run(per_schedule_lookup(fake_db, schedule_id))
+        entry = batched.get(schedule_id)
+        assert (entry and {"latest": entry["latest"], "progress_updates": entry["progress_updates"]}) == expected
+
+
+@pytest.mark.parametrize("schedule_count", [1, 20])
+def test_todays_schedules_cost_the_same_round_trips_for_any_number_of_schedules(monkeypatch, schedule_count):
+    fake_db = build_db(schedule_count)
+    monkeypatch.setattr(server, "db", fake_db)
+
+    schedules = asyncio.run(server.get_todays_schedules(USER))
+
+    assert len(schedules) == schedule_count
+    assert schedules[0]["activity_status"] == "Pending"
+    assert all(s["activity_status"] == "Finished" for s in schedules[1:])
+    # Schedules, grouped activities and progress updates
+    assert fake_db.round_trips == 3
@@ -0,0 +1,57 @@
+import asyncio
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import server
+
+MANAGER = {"id": "manager", "username": "Manager", "role": "Manager", "division": "TS"}
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def xlsx_bytes(sheet_rows: str, shared_strings: list) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("xl/workbook.xml", (
+            f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>'
+        ))
+        archive.writestr("xl/sharedStrings.xml", (
+            f'<sst xmlns="{MAIN_NS}">' + "".join(f"<si><t>{s}</t></si>" for s in shared_strings) + "</sst>"
+        ))
+        archive.writestr("xl/worksheets/sheet1.xml", f'<worksheet xmlns="{MAIN_NS}"><sheetData>{sheet_rows}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+def upload(data: bytes, filename: str):
+    return asyncio.run(server.bulk_upload_schedules(UploadFile(file=io.BytesIO(data), filename=filename), False, MANAGER))
+
+
+def test_csv_field_over_the_size_limit_is_a_400():
+    data = b"user_email,title\n" + b"a@b.c," + b"x" * 200_000 + b"\n"
+
+    with pytest.raises(HTTPException) as excinfo:
+        upload(data, "schedules.csv")
+    assert excinfo.value.status_code == 400
+
+
+def test_xlsx_shared_string_index_out_of_range_is_a_400():
+    data = xlsx_bytes('<row r="1"><c r="A1" t="s"><v>7</v></c></row>', ["user_email"])
+
+    with pytest.raises(HTTPException) as excinfo:
+        upload(data, "schedules.xlsx")
+    assert excinfo.value.status_code == 400
+    assert "out of range" in excinfo.value.detail
+
+
+def test_out_of_range_numeric_date_is_reported_as_a_row_error():
+    with pytest.raises(ValueError, match="out of range"):
+        server.parse_sheet_datetime("20251201")
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from fakes import FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def comment(i: int) -> dict:
+    return {
+        "id": f"c{i:03d}", "parent_type": "report", "parent_id": "r1", "user_id": "u",
+        "user_name": "U", "text": str(i), "created_at": START + timedelta(minutes=i),
+    }
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake_db = FakeDB(
+        comments=[comment(i) for i in range(server.COMMENT_PAGE_SIZE + 10)],
+        reports=[{"id": "r1", "comment_count": server.COMMENT_PAGE_SIZE + 10}],
+    )
+    monkeypatch.setattr(server, "db", fake_db)
+    return fake_db
+
+
+def test_detail_embeds_the_newest_comments_including_one_just_added(fake_db):
+    async def add_then_open():
+        await server.add_comment("report", "r1", USER, "just now")
+        return await server.attach_first_comment_page("report", {"id": "r1"})
+
+    report = asyncio.run(add_then_open())
+
+    texts = [c["text"] for c in report["comments"]]
+    assert len(texts) == server.COMMENT_PAGE_SIZE
+    assert texts[-1] == "just now"
+    assert texts[0] == "11"
+
+
+def test_cursor_pages_backwards_to_the_oldest_comments(fake_db):
+    first = asyncio.run(server.comment_page("report", "r1"))
+    earlier = asyncio.run(server.comment_page("report", "r1", first["next_cursor"]))
+
+    assert [c["text"] for c in earlier["items"]] == [str(i) for i in range(10)]
+    assert earlier["next_cursor"] is None
@@ -0,0 +1,42 @@
+import asyncio
+
+import server
+
+
+class FakeCollection:
+    def __init__(self, indexes: dict):
+        self.indexes = indexes
+        self.dropped = []
+
+    async def create_index(self, keys, **options):
+        pass
+
+    async def index_information(self):
+        return self.indexes
+
+    async def drop_index(self, name):
+        self.dropped.append(name)
+
+
+class FakeDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        # Everything the manifest declares (directions as the server may report them), plus _id_
+        indexes = {"_id_": {"key": [("_id", 1)]}}
+        for i, (keys, _) in enumerate(server.INDEXES.get(name, [])):
+            indexes[f"declared_{i}"] = {"key": [(field, float(direction)) for field, direction in keys]}
+        if name == "reports":
+            indexes["expires_at_1"] = {"key": [("expires_at", 1)], "expireAfterSeconds": 60}
+        return self.collections.setdefault(name, FakeCollection(indexes))
+
+
+def test_startup_sync_reports_undeclared_indexes_without_dropping_them(monkeypatch):
+    fake_db = FakeDB()
+    monkeypatch.setattr(server, "db", fake_db)
+
+    asyncio.run(server.ensure_indexes())
+
+    assert all(not collection.dropped for collection in fake_db.collections.values())
+    assert asyncio.run(server.undeclared_indexes()) == {"reports": ["expires_at_1"]}
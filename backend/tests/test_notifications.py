@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+
+
+def notification(i: int, read: bool = False) -> dict:
+    return {"id": f"n{i}", "user_id": USER["id"], "title": "t", "message": "m", "type": "report", "read": read}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake_db = FakeDB(
+        notifications=[notification(i) for i in range(3)] + [notification(9, read=True)],
+        notification_counters=FakeCollection(unique="user_id"),
+    )
+    monkeypatch.setattr(server, "db", fake_db)
+    return fake_db
+
+
+def unread_count() -> int:
+    return asyncio.run(server.get_unread_count(USER))["count"]
+
+
+def test_first_read_seeds_from_history_even_after_an_increment_created_the_counter(fake_db):
+    # An existing user with 3 unread notifications receives a new one before ever reading the badge
+    new = notification(4)
+    fake_db.notifications.docs.append(new)
+    asyncio.run(server.increment_unread_counters([new]))
+
+    assert unread_count() == 4
+
+
+def test_increments_after_seeding_accumulate(fake_db):
+    assert unread_count() == 3
+
+    new = [notification(5), notification(6)]
+    fake_db.notifications.docs.extend(new)
+    asyncio.run(server.increment_unread_counters(new))
+
+    assert unread_count() == 5
+    assert fake_db.notification_counters.docs == [{"user_id": USER["id"], "unread": 5, "seeded": True}]
+
+
+def test_reconcile_skips_a_counter_that_moved_since_it_was_read(fake_db):
+    fake_db.notification_counters.docs.append({"user_id": USER["id"], "unread": 7, "seeded": True})
+    original_find = fake_db.notification_counters.find
+
+    def find_then_increment(*args, **kwargs):
+        cursor = original_find(*args, **kwargs)
+        # An increment lands between the reconcile's read and its write
+        fake_db.notification_counters.docs[0]["unread"] += 1
+        return cursor
+
+    fake_db.notification_counters.find = find_then_increment
+    asyncio.run(server.reconcile_unread_counters())
+
+    assert fake_db.notification_counters.docs[0]["unread"] == 8
+
+
+def test_streams_only_receive_notifications_the_queue_has_written(fake_db, monkeypatch):
+    published = []
+
+    def record_publish(docs):
+        # A client may mark it read as soon as it arrives, so it must already be stored
+        stored = {d["id"] for d in fake_db.notifications.docs}
+        published.extend(doc["id"] in stored for doc in docs)
+
+    monkeypatch.setattr(server.notification_hub, "publish", record_publish)
+
+    async def create_through_buffer():
+        queue = server.NotificationQueue(batch_size=10, flush_interval=0.01, max_size=100, synchronous=False)
+        monkeypatch.setattr(server, "notification_queue", queue)
+        queue.start()
+        await server.create_notifications([notification(5), notification(6)])
+        await queue.stop()
+
+    asyncio.run(create_through_buffer())
+
+    assert published == [True, True]
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_hash_and_verify_round_trip():
+    async def round_trip():
+        hashed = await server.get_password_hash("s3cret")
+        return await server.verify_password("s3cret", hashed), await server.verify_password("wrong", hashed)
+
+    assert asyncio.run(round_trip()) == (True, False)
+
+
+def test_hashing_runs_off_the_event_loop(monkeypatch):
+    release = threading.Event()
+
+    def slow_hash(password):
+        # Only returns once the event loop has run the coroutine that sets the event
+        assert release.wait(timeout=5), "event loop was blocked while hashing"
+        return "hashed"
+
+    monkeypatch.setattr(server.pwd_context, "hash", slow_hash)
+    hasher = server.PasswordHasher(workers=1, queue_limit=0)
+
+    async def hash_while_loop_runs():
+        task = asyncio.create_task(hasher.hash("pw"))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await task
+
+    assert asyncio.run(hash_while_loop_runs()) == "hashed"
+    hasher.shutdown()
+
+
+def test_requests_beyond_workers_and_queue_are_shed_with_503(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(server.pwd_context, "hash", lambda password: release.wait(timeout=5) and "hashed")
+    hasher = server.PasswordHasher(workers=1, queue_limit=1)
+
+    async def burst():
+        running = [asyncio.create_task(hasher.hash("pw")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as excinfo:
+            await hasher.hash("pw")
+        release.set()
+        return excinfo.value.status_code, await asyncio.gather(*running)
+
+    status, results = asyncio.run(burst())
+    hasher.shutdown()
+
+    assert status == 503
+    assert results == ["hashed", "hashed"]
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["in_flight"] == 0
@@ -0,0 +1,94 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+SUBMITTER = {"id": "staff", "username": "Staff", "role": "Staff", "division": "TS"}
+SPV = {"id": "spv", "username": "SPV", "role": "SPV", "division": "TS"}
+MANAGER = {"id": "manager", "username": "Manager", "role": "Manager", "division": "TS"}
+VP = {"id": "vp", "username": "VP", "role": "VP", "division": None}
+
+
+class FakeReports:
+    """Just enough of the reports collection; conditional updates are atomic as in Mongo"""
+
+    def __init__(self, report: dict):
+        self.docs = {report["id"]: report}
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["id"])
+        snapshot = copy.deepcopy(doc) if doc else None
+        # Yield after reading so every concurrent request holds the same version before any of them writes
+        await asyncio.sleep(0)
+        return snapshot
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        doc = self.docs.get(query["id"])
+        if doc is None or any(doc.get(field) != value for field, value in query.items()):
+            return None
+        doc.update(update["$set"])
+        return copy.deepcopy(doc)
+
+
+class FakeDB:
+    def __init__(self, report: dict):
+        self.reports = FakeReports(report)
+
+
+@pytest.fixture
+def report(monkeypatch):
+    report = {
+        "id": "report-1",
+        "title": "Weekly check",
+        "status": "Pending SPV",
+        "version": 1,
+        "submitted_by": SUBMITTER["id"],
+        "submitter_division": "TS",
+        "current_approver": SPV["id"],
+    }
+    fake_db = FakeDB(report)
+    monkeypatch.setattr(server, "db", fake_db)
+
+    notifications = []
+
+    async def record_notification(**kwargs):
+        notifications.append(kwargs)
+
+    monkeypatch.setattr(server, "create_notification", record_notification)
+
+    routing = server.ApproverRouting(ttl_seconds=60)
+    routing._table = {("Manager", "TS"): MANAGER, ("VP", None): VP}
+    routing._expires_at = float("inf")
+    monkeypatch.setattr(server, "approver_routing", routing)
+
+    return fake_db.reports.docs["report-1"]
+
+
+async def approve_concurrently(*users):
+    return await asyncio.gather(
+        *(server.approve_report(server.ApprovalAction(report_id="report-1", action="approve"), user) for user in users),
+        return_exceptions=True
+    )
+
+
+@pytest.mark.parametrize("first, second", [(SPV, MANAGER), (MANAGER, VP), (VP, VP)])
+def test_concurrent_approvals_of_one_version_yield_one_success_and_one_conflict(report, first, second):
+    results = asyncio.run(approve_concurrently(first, second))
+
+    successes = [r for r in results if isinstance(r, dict)]
+    conflicts = [r for r in results if isinstance(r, HTTPException) and r.status_code == 409]
+    assert len(successes) == 1
+    assert len(conflicts) == 1
+    assert report["status"] == successes[0]["new_status"]
+
+
+def test_approval_after_a_conflict_applies_to_the_new_state(report):
+    asyncio.run(approve_concurrently(SPV, MANAGER))
+    assert report["status"] in ("Pending Manager", "Pending VP")
+
+    result = asyncio.run(server.approve_report(server.ApprovalAction(report_id="report-1", action="approve"), VP))
+    assert result["new_status"] == "Final"
+    assert report["status"] == "Final"
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from fakes import FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def report(i: int, title: str = "Routine check", description: str = "") -> dict:
+    return {
+        "id": f"r{i:03d}", "title": title, "description": description, "status": "Pending",
+        "submitted_by_name": "User", "site_name": "Site", "created_at": START + timedelta(hours=i),
+    }
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake_db = FakeDB(reports=[report(i) for i in range(30)] + [
+        report(30, title="Fibre cut (north)"),
+        report(31, description="Splice the FIBRE near the tower"),
+    ])
+    monkeypatch.setattr(server, "db", fake_db)
+    return fake_db
+
+
+def search(q: str, cursor=None, limit: int = 20) -> dict:
+    return asyncio.run(server.get_reports(q=q, cursor=cursor, limit=limit, current_user=USER))
+
+
+def test_search_matches_title_and_description_beyond_the_first_page(fake_db):
+    page = search("fibre")
+
+    assert [r["id"] for r in page["items"]] == ["r031", "r030"]
+    assert page["next_cursor"] is None
+
+
+def test_search_treats_the_term_literally_and_keeps_paginating(fake_db):
+    assert [r["id"] for r in search("(north)")["items"]] == ["r030"]
+    assert search(".*")["items"] == []
+
+    first = search("routine", limit=20)
+    rest = search("routine", cursor=first["next_cursor"], limit=20)
+    assert len(first["items"]) + len(rest["items"]) == 31
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from fakes import FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake_db = FakeDB(schedules=[{
+        "id": "s1", "user_id": USER["id"], "division": "TS", "title": "Far away",
+        "start_date": datetime(2024, 3, 5, 9, 0, tzinfo=timezone.utc),
+    }])
+    monkeypatch.setattr(server, "db", fake_db)
+    return fake_db
+
+
+def test_a_single_schedule_is_served_by_id_with_wall_clock_times(fake_db):
+    schedule = asyncio.run(server.get_schedule("s1", USER))
+
+    assert schedule["title"] == "Far away"
+    assert schedule["start_date"] == datetime(2024, 3, 5, 9, 0)
+
+
+def test_a_missing_schedule_is_a_404(fake_db):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_schedule("missing", USER))
+    assert excinfo.value.status_code == 404
+
+
+def test_change_requests_route_is_not_captured_by_the_schedule_id_route():
+    paths = [route.path for route in server.app.routes if "GET" in getattr(route, "methods", ())]
+
+    assert paths.index("/api/schedules/change-requests") < paths.index("/api/schedules/{schedule_id}")
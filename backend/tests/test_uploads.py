@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import server
+from fakes import FakeDB
+
+USER = {"id": "user-1", "username": "User", "role": "Staff", "division": "TS"}
+
+
+class RecordingUpload(UploadFile):
+    """Records the size of every read so tests can see how an upload is consumed"""
+
+    def __init__(self, data: bytes, filename: str):
+        super().__init__(file=io.BytesIO(data), filename=filename)
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads.append(size)
+        return await super().read(size)
+
+
+def png_bytes(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "BLOB_DIR", tmp_path / "blobs")
+    return tmp_path
+
+
+def test_profile_photo_decompression_bomb_is_rejected_with_400(upload_dir, monkeypatch):
+    # Anything over twice MAX_IMAGE_PIXELS raises DecompressionBombError, which is not an OSError
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    photo = UploadFile(file=io.BytesIO(png_bytes(64, 64)), filename="bomb.png")
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.upload_profile_photo(photo, USER))
+    assert excinfo.value.status_code == 400
+
+
+def test_save_upload_streams_in_chunks_and_reports_size_and_checksum(upload_dir, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_CHUNK_SIZE", 1024)
+    data = bytes(range(256)) * 20
+    upload = RecordingUpload(data, "report.bin")
+
+    result = asyncio.run(server.save_upload(upload, upload_dir / "reports" / "report.bin", max_bytes=10_000))
+
+    assert result == {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+    assert (upload_dir / "reports" / "report.bin").read_bytes() == data
+    assert len(upload.reads) > 1 and all(0 < size <= 1024 for size in upload.reads)
+
+
+def test_save_upload_over_the_cap_is_a_413_and_leaves_nothing_behind(upload_dir, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_CHUNK_SIZE", 1024)
+    upload = RecordingUpload(b"x" * 5000, "big.bin")
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.save_upload(upload, upload_dir / "reports" / "big.bin", max_bytes=2048))
+
+    assert excinfo.value.status_code == 413
+    assert list((upload_dir / "reports").iterdir()) == []
+    # Reading stops at the first chunk past the cap rather than draining the body
+    assert len(upload.reads) == 3
+
+
+def test_read_upload_over_the_cap_is_a_413():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.read_upload(UploadFile(file=io.BytesIO(b"x" * 101), filename="photo.png"), max_bytes=100))
+    assert excinfo.value.status_code == 413
+
+
+@pytest.fixture
+def served_file(upload_dir, monkeypatch):
+    monkeypatch.setattr(server, "db", FakeDB())
+    (upload_dir / "reports").mkdir()
+    data = bytes(range(256)) * 4
+    (upload_dir / "reports" / "report.pdf").write_bytes(data)
+    return data
+
+
+def test_uploads_carry_a_content_etag_and_revalidate_with_304(served_file):
+    client = TestClient(server.app)
+
+    response = client.get("/uploads/reports/report.pdf")
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and response.content == served_file
+    assert etag == f'"{hashlib.sha256(served_file).hexdigest()}"'
+
+    revalidated = client.get("/uploads/reports/report.pdf", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+
+
+def test_uploads_serve_byte_ranges(served_file):
+    client = TestClient(server.app)
+
+    partial = client.get("/uploads/reports/report.pdf", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == served_file[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(served_file)}"
+
+    suffix = client.get("/uploads/reports/report.pdf", headers={"Range": "bytes=-5"})
+    assert suffix.status_code == 206 and suffix.content == served_file[-5:]
+
+    unsatisfiable = client.get("/uploads/reports/report.pdf", headers={"Range": f"bytes={len(served_file)}-"})
+    assert unsatisfiable.status_code == 416
+
+
+def test_a_stale_if_range_gets_the_whole_file(served_file):
+    client = TestClient(server.app)
+
+    response = client.get("/uploads/reports/report.pdf", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200 and response.content == served_file
+
+
+def test_paths_outside_the_upload_dir_are_not_served(served_file, upload_dir):
+    (upload_dir.parent / "outside.txt").write_text("secret")
+
+    response = TestClient(server.app).get("/uploads/..%2Foutside.txt")
+
+    assert response.status_code == 404
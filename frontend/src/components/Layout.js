@@ -5,6 +5,7 @@ import { useNotifications } from '../context/NotificationContext';
 // import { ThemeToggle } from './ThemeToggle'; // Removed
 import { Bell, Calendar, FileText, Ticket, LayoutDashboard, LogOut, User, MapPin, UserCheck, Settings, Menu, ClipboardCheck, Tag, Users, BarChart } from 'lucide-react';
 import { Button } from './ui/button';
+import { photoSrc } from '../lib/utils';
 import {
   DropdownMenu,
   DropdownMenuContent,
@@ -212,7 +213,7 @@ const Layout = ({ children }) => {
                     <div className="w-8 h-8 bg-gradient-to-br from-gray-500 to-gray-600 rounded-full flex items-center justify-center overflow-hidden">
                       {user?.profile_photo ? (
                         <img
-                          src={`data:image/jpeg;base64,${user.profile_photo}`}
+                          src={photoSrc(user.profile_photo_thumb || user.profile_photo)}
                           alt="Profile"
                           className="w-full h-full object-cover"
                         />
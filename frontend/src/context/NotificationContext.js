@@ -7,6 +7,8 @@ const NotificationContext = createContext();
 export const useNotifications = () => useContext(NotificationContext);
 
 const API = `${process.env.REACT_APP_API_URL}/api`;
+const FALLBACK_POLL_MS = 10000; // While the push stream is unavailable
+const RESYNC_POLL_MS = 120000; // Safety resync while the push stream is connected
 
 export const NotificationProvider = ({ children }) => {
   const { user } = useAuth();
@@ -14,11 +16,39 @@ export const NotificationProvider = ({ children }) => {
   const [unreadCount, setUnreadCount] = useState(0);
 
   useEffect(() => {
-    if (user) {
-      fetchNotifications();
-      const interval = setInterval(fetchNotifications, 10000); // Poll every 10 seconds
-      return () => clearInterval(interval);
+    if (!user) return;
+
+    fetchNotifications();
+    let interval = setInterval(fetchNotifications, FALLBACK_POLL_MS);
+    const setPollInterval = (ms) => {
+      clearInterval(interval);
+      interval = setInterval(fetchNotifications, ms);
+    };
+
+    // Server push; polling stays as the fallback when the stream is down
+    let source = null;
+    const token = localStorage.getItem('token');
+    if (window.EventSource && token) {
+      source = new EventSource(`${API}/notifications/stream?token=${encodeURIComponent(token)}`);
+      source.onopen = () => {
+        setPollInterval(RESYNC_POLL_MS);
+        fetchNotifications();
+      };
+      source.addEventListener('notification', (event) => {
+        const notification = JSON.parse(event.data);
+        setNotifications((prev) => [notification, ...prev].slice(0, 100));
+        setUnreadCount((prev) => prev + 1);
+      });
+      source.onerror = () => {
+        // EventSource reconnects on its own; poll until it does
+        setPollInterval(FALLBACK_POLL_MS);
+      };
     }
+
+    return () => {
+      clearInterval(interval);
+      if (source) source.close();
+    };
   }, [user]);
 
   const fetchNotifications = async () => {
@@ -4,3 +4,11 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Profile photos are served from /uploads; older accounts may still carry a base64 blob
+export function photoSrc(photo) {
+  if (!photo) return null;
+  if (photo.startsWith('data:')) return photo;
+  if (photo.startsWith('/')) return `${process.env.REACT_APP_API_URL}${photo}`;
+  return `data:image/jpeg;base64,${photo}`;
+}
@@ -336,7 +336,7 @@ const Activity = () => {
                                         <div className="mt-2">
                                           <img
                                             src={update.image_url
-                                              ? `${process.env.REACT_APP_API_URL}${update.image_url}`
+                                              ? `${process.env.REACT_APP_API_URL}${update.image_thumb_url || update.image_url}`
                                               : `data:image/jpeg;base64,${update.image_data}`}
                                             alt="Update attachment"
                                             className="max-h-32 rounded border border-gray-600"
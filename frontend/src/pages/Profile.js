@@ -7,6 +7,7 @@ import { Label } from '../components/ui/label';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { toast } from 'sonner';
 import { User, Lock } from 'lucide-react';
+import { photoSrc } from '../lib/utils';
 
 const API = `${process.env.REACT_APP_API_URL}/api`;
 
@@ -125,7 +126,7 @@ const Profile = () => {
             <div className="flex items-center space-x-6">
               <div className="w-32 h-32 rounded-full bg-gradient-to-br from-gray-500 to-gray-600 flex items-center justify-center overflow-hidden">
                 {photoPreview ? (
-                  <img src={photoPreview.startsWith('data:') ? photoPreview : `data:image/jpeg;base64,${photoPreview}`} alt="Profile" className="w-full h-full object-cover" />
+                  <img src={photoSrc(photoPreview)} alt="Profile" className="w-full h-full object-cover" />
                 ) : (
                   <User size={48} className="text-white" />
                 )}
@@ -11,7 +11,7 @@ import { Badge } from '../components/ui/badge';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { toast } from 'sonner';
-import { Plus, Download, Check, X, Eye, Filter, Edit, Search, ArrowUpDown, ChevronsUpDown, Trash2, FileText, ExternalLink } from 'lucide-react';
+import { Plus, Download, Check, X, Eye, Filter, Edit, Search, ArrowUpDown, ChevronsUpDown, Trash2, FileText, ExternalLink, MessageSquare } from 'lucide-react';
 import { ScrollArea } from '../components/ui/scroll-area';
 import { Command, CommandEmpty, CommandGroup, CommandInput, CommandItem, CommandList } from '../components/ui/command';
 import { Popover, PopoverContent, PopoverTrigger } from '../components/ui/popover';
@@ -192,6 +192,7 @@ const Reports = () => {
   const { user } = useAuth();
   const location = useLocation();
   const [reports, setReports] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [sites, setSites] = useState([]);
   const [tickets, setTickets] = useState([]);
   const [categories, setCategories] = useState([]); // NEW: Activity categories
@@ -207,6 +208,7 @@ const Reports = () => {
   const [editSiteSearch, setEditSiteSearch] = useState(''); // PHASE 3: Edit site search
   const [editTicketSearch, setEditTicketSearch] = useState(''); // PHASE 3: Edit ticket search
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [filterNotApproved, setFilterNotApproved] = useState(false); // NEW: Filter for not approved reports
   const [sortOrder, setSortOrder] = useState('newest');
   const [formData, setFormData] = useState({
@@ -228,7 +230,6 @@ const Reports = () => {
   });
 
   useEffect(() => {
-    fetchReports();
     fetchSites();
     fetchTickets();
     fetchCategories(); // NEW: Fetch categories
@@ -243,18 +244,29 @@ const Reports = () => {
     }
   }, [location.state]);
 
+  // Search runs on the server, so wait for typing to pause before refetching
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchQuery.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
   useEffect(() => {
-    fetchReports(siteFilter, divisionFilter);
-  }, [siteFilter, divisionFilter]);
+    fetchReports();
+  }, [siteFilter, divisionFilter, filterNotApproved, sortOrder, debouncedSearch]);
 
-  const fetchReports = async (site_id = '', division = 'all') => {
+  // Loads the first page for the current filters, or appends the page at `cursor`
+  const fetchReports = async (cursor = null) => {
     try {
-      const params = {};
-      if (site_id && site_id !== 'all') params.site_id = site_id;
-      if (division && division !== 'all') params.division = division;
+      const params = { order: sortOrder };
+      if (siteFilter && siteFilter !== 'all') params.site_id = siteFilter;
+      if (divisionFilter && divisionFilter !== 'all') params.division = divisionFilter;
+      if (filterNotApproved) params.exclude_final = true;
+      if (debouncedSearch) params.q = debouncedSearch;
+      if (cursor) params.cursor = cursor;
 
       const response = await axios.get(`${API}/reports`, { params });
-      setReports(response.data);
+      setReports(cursor ? (prev) => [...prev, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch reports:', error);
     }
@@ -329,9 +341,11 @@ const Reports = () => {
 
       await axios.post(`${API}/reports/approve`, payload);
       toast.success(action === 'approve' ? 'Report approved!' : 'Report sent for revision');
-      fetchReports(siteFilter);
+      fetchReports();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to process approval');
+      // Someone else acted on the report first; show its current state
+      if (error.response?.status === 409) fetchReports();
     }
   };
 
@@ -346,13 +360,22 @@ const Reports = () => {
   };
 
   // PHASE 3: Edit report functionality
-  const handleEditReport = (report) => {
-    setSelectedReport(report);
+  const handleEditReport = async (report) => {
+    // The list omits descriptions, so load the full report
+    let fullReport = report;
+    try {
+      const response = await axios.get(`${API}/reports/${report.id}`);
+      fullReport = response.data;
+    } catch (error) {
+      toast.error('Failed to load report');
+      return;
+    }
+    setSelectedReport(fullReport);
     setEditFormData({
-      title: report.title,
-      description: report.description,
-      site_id: report.site_id || '',
-      ticket_id: report.ticket_id || '',
+      title: fullReport.title,
+      description: fullReport.description,
+      site_id: fullReport.site_id || '',
+      ticket_id: fullReport.ticket_id || '',
       file: null // Reset file
     });
     setEditSiteSearch('');
@@ -376,7 +399,7 @@ const Reports = () => {
       });
       toast.success('Report updated successfully!');
       setEditOpen(false);
-      fetchReports(siteFilter);
+      fetchReports();
       // Refresh selected report if viewing it
       if (viewOpen && selectedReport.id) {
         handleViewReport(selectedReport.id);
@@ -400,7 +423,7 @@ const Reports = () => {
       toast.success('Report deleted successfully');
       setOpen(false); // Close any open dialogs if needed
       setViewOpen(false);
-      fetchReports(siteFilter);
+      fetchReports();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to delete report');
     }
@@ -422,6 +445,21 @@ const Reports = () => {
     }
   };
 
+  const handleLoadEarlierComments = async () => {
+    try {
+      const response = await axios.get(`${API}/reports/${selectedReport.id}/comments`, {
+        params: { cursor: selectedReport.comments_next_cursor }
+      });
+      setSelectedReport((prev) => ({
+        ...prev,
+        comments: [...response.data.items, ...prev.comments],
+        comments_next_cursor: response.data.next_cursor
+      }));
+    } catch (error) {
+      toast.error('Failed to load earlier comments');
+    }
+  };
+
   const downloadFile = (fileUrl, fileData, fileName) => {
     if (fileUrl) {
       // Use URL if available
@@ -477,22 +515,8 @@ const Reports = () => {
     ticket.title.toLowerCase().includes(ticketSearch.toLowerCase())
   );
 
-  // Filter and sort reports
-  const filteredAndSortedReports = reports
-    .filter(report => {
-      // NEW: Filter out approved (Final) reports if filter enabled
-      if (filterNotApproved && report.status === 'Final') {
-        return false;
-      }
-
-      const query = searchQuery.toLowerCase();
-      return (
-        report.title.toLowerCase().includes(query) ||
-        report.description.toLowerCase().includes(query) ||
-        report.submitted_by_name.toLowerCase().includes(query) ||
-        (report.site_name && report.site_name.toLowerCase().includes(query))
-      );
-    })
+  // Search and the approval filter are applied by the server; only the order is adjusted here
+  const filteredAndSortedReports = [...reports]
     .sort((a, b) => {
       // Move 'Final' status to the bottom
       if (a.status === 'Final' && b.status !== 'Final') return 1;
@@ -695,7 +719,7 @@ const Reports = () => {
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
         {filteredAndSortedReports.length === 0 ? (
           <div className="col-span-full text-center py-12 text-slate-400">
-            {reports.length === 0 ? 'No reports submitted yet' : 'No reports match your search'}
+            {debouncedSearch ? 'No reports match your search' : 'No reports submitted yet'}
           </div>
         ) : (
           filteredAndSortedReports.map((report) => (
@@ -717,7 +741,10 @@ const Reports = () => {
                 </CardDescription>
               </CardHeader>
               <CardContent className="space-y-3">
-                <p className="text-sm text-slate-300">{report.description}</p>
+                <p className="text-xs text-slate-400 flex items-center gap-1">
+                  <MessageSquare size={12} />
+                  {report.comment_count || 0} comment{report.comment_count === 1 ? '' : 's'}
+                </p>
 
                 {report.rejection_comment && (
                   <div className="p-3 bg-orange-900/20 border border-orange-800/50 rounded-lg">
@@ -783,6 +810,14 @@ const Reports = () => {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchReports(nextCursor)} data-testid="load-more-reports">
+            Load more
+          </Button>
+        </div>
+      )}
+
       {/* View Report Dialog */}
       <Dialog open={viewOpen} onOpenChange={setViewOpen}>
         <DialogContent className="max-w-4xl max-h-[90vh] flex flex-col" data-testid="view-report-dialog">
@@ -881,9 +916,14 @@ const Reports = () => {
                 <div className="pt-4 border-t">
                   <h4 className="font-semibold mb-3">Comments</h4>
                   <div className="space-y-4 max-h-60 overflow-y-auto mb-4 custom-scrollbar">
+                    {selectedReport.comments_next_cursor && (
+                      <Button type="button" variant="outline" size="sm" className="w-full" onClick={handleLoadEarlierComments}>
+                        Load earlier comments
+                      </Button>
+                    )}
                     {selectedReport.comments && selectedReport.comments.length > 0 ? (
                       selectedReport.comments.map((comment, index) => (
-                        <div key={index} className="bg-slate-800/50 border border-slate-700 p-3 rounded-lg text-sm">
+                        <div key={comment.id || index} className="bg-slate-800/50 border border-slate-700 p-3 rounded-lg text-sm">
                           <div className="flex justify-between items-start mb-1">
                             <span className="font-medium text-slate-200">{comment.user_name}</span>
                             <span className="text-xs text-slate-400">
@@ -303,44 +303,66 @@ const Schedule = () => {
   const canEdit = user?.role === 'VP' || user?.role === 'Manager' || user?.role === 'SPV' || user?.role === 'SuperUser';
 
   useEffect(() => {
-    fetchSchedules();
     fetchUsers();
     fetchSites(); // NEW: Fetch sites
     fetchCategories(); // NEW: Fetch categories
     fetchCategories(); // NEW: Fetch categories
   }, []);
 
+  // Only load the schedules around the visible calendar range, filtered by the server
+  useEffect(() => {
+    fetchSchedules();
+  }, [date, view, filterUserId, filterDivision]);
+
   // Handle deep linking from notifications
   useEffect(() => {
-    if (location.state?.openScheduleId && schedules.length > 0) {
-      const scheduleId = location.state.openScheduleId;
-      const schedule = schedules.find(s => s.id === scheduleId);
-
-      if (schedule) {
-        // Navigate to the date of the schedule
-        const newDate = new Date(schedule.start_date);
-        setDate(newDate);
-        // Optional: Switch to day view or agenda view to make it easier to see?
-        // setView('day'); 
-
-        // Show the summary/details for this day
-        showDailySummary(newDate);
-
-        // Clear state to avoid reopening on refresh (optional, but good practice)
-        window.history.replaceState({}, document.title);
-      }
+    if (location.state?.openScheduleId) {
+      openLinkedSchedule(location.state.openScheduleId);
+      // Clear state to avoid reopening on refresh
+      window.history.replaceState({}, document.title);
     }
-  }, [location.state, schedules]);
+  }, [location.state]);
+
+  // All schedules in the calendar range around `anchor`, following the cursor to the end
+  const loadSchedules = async (anchor) => {
+    // Pad the window by a week so the month grid's leading/trailing days are filled
+    const unit = view === 'month' ? 'month' : view === 'week' ? 'week' : 'day';
+    const params = {
+      start: moment(anchor).startOf(unit).subtract(7, 'days').format('YYYY-MM-DDTHH:mm:ss'),
+      end: moment(anchor).endOf(unit).add(7, 'days').format('YYYY-MM-DDTHH:mm:ss'),
+    };
+    if (filterUserId && filterUserId !== 'all') params.user_id = filterUserId;
+    if (filterDivision && filterDivision !== 'all') params.division = filterDivision;
+    const items = [];
+    let cursor = null;
+    do {
+      const response = await axios.get(`${API}/schedules`, { params: { ...params, cursor } });
+      items.push(...response.data.items);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return items;
+  };
 
   const fetchSchedules = async () => {
     try {
-      const response = await axios.get(`${API}/schedules`);
-      setSchedules(response.data);
+      setSchedules(await loadSchedules(date));
     } catch (error) {
       console.error('Failed to fetch schedules:', error);
     }
   };
 
+  // The linked schedule may lie outside the loaded range, so fetch it and move the calendar to its date
+  const openLinkedSchedule = async (scheduleId) => {
+    try {
+      const response = await axios.get(`${API}/schedules/${scheduleId}`);
+      const newDate = new Date(response.data.start_date);
+      setDate(newDate);
+      showDailySummary(newDate, await loadSchedules(newDate));
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to open schedule');
+    }
+  };
+
   const fetchUsers = async () => {
     try {
       const response = await axios.get(`${API}/users`);
@@ -367,14 +389,7 @@ const Schedule = () => {
       console.error('Failed to fetch categories:', error);
     }
   };
-  // NEW: Apply staff and division filter
-  const filteredSchedules = schedules.filter(s => {
-    if (filterUserId && filterUserId !== 'all' && s.user_id !== filterUserId) return false;
-    if (filterDivision && filterDivision !== 'all' && s.division !== filterDivision) return false;
-    return true;
-  });
-
-  const events = filteredSchedules.map(schedule => ({
+  const events = schedules.map(schedule => ({
     id: schedule.id,
     title: `${schedule.user_name}: ${schedule.title}`,
     start: new Date(schedule.start_date),
@@ -387,23 +402,15 @@ const Schedule = () => {
     showDailySummary(start);
   };
 
-  const showDailySummary = (date) => {
+  // Staff and division filters are already applied by the server
+  const showDailySummary = (date, source = schedules) => {
     const selectedDay = moment(date).startOf('day');
-    let filtered = schedules.filter(schedule => {
+    const filtered = source.filter(schedule => {
       const scheduleStart = moment(schedule.start_date).startOf('day');
       const scheduleEnd = schedule.end_date ? moment(schedule.end_date).startOf('day') : scheduleStart;
       return selectedDay.isBetween(scheduleStart, scheduleEnd, null, '[]');
     });
 
-    // Apply staff filter if active
-    if (filterUserId && filterUserId !== 'all') {
-      filtered = filtered.filter(s => s.user_id === filterUserId);
-    }
-    // Apply division filter if active
-    if (filterDivision && filterDivision !== 'all') {
-      filtered = filtered.filter(s => s.division === filterDivision);
-    }
-
     setDailySchedules(filtered);
     setSelectedDate(date);
     setDailySummaryOpen(true);
@@ -534,6 +541,22 @@ const Schedule = () => {
     }
   };
 
+  const handleLoadMoreUpdates = async () => {
+    try {
+      const response = await axios.get(
+        `${API}/activities/schedule/${activityData.schedule_id}/progress-updates`,
+        { params: { cursor: activityData.progress_updates_next_cursor } }
+      );
+      setActivityData((prev) => ({
+        ...prev,
+        progress_updates: [...prev.progress_updates, ...response.data.items],
+        progress_updates_next_cursor: response.data.next_cursor
+      }));
+    } catch (error) {
+      toast.error('Failed to load more progress updates');
+    }
+  };
+
   const getStatusBadge = (status) => {
     const statusConfig = {
       'Pending': { color: 'bg-slate-200 text-slate-700', icon: Clock },
@@ -909,7 +932,7 @@ const Schedule = () => {
           {(() => {
             // Filter for today's schedules
             const today = moment().startOf('day');
-            const todaySchedules = filteredSchedules.filter(schedule => {
+            const todaySchedules = schedules.filter(schedule => {
               const scheduleStart = moment(schedule.start_date).startOf('day');
               const scheduleEnd = schedule.end_date ? moment(schedule.end_date).startOf('day') : scheduleStart;
               return today.isBetween(scheduleStart, scheduleEnd, null, '[]');
@@ -1198,7 +1221,7 @@ const Schedule = () => {
                       </h4>
                       <div className="space-y-2 max-h-60 overflow-y-auto">
                         {activityData.progress_updates.map((update, idx) => (
-                          <div key={idx} className="text-sm bg-slate-800/50 border border-slate-700 p-2 rounded shadow-sm">
+                          <div key={update.id || idx} className="text-sm bg-slate-800/50 border border-slate-700 p-2 rounded shadow-sm">
                             <div className="flex justify-between items-start">
                               <div className="flex-1">
                                 <span>{update.update_text}</span>
@@ -1206,13 +1229,13 @@ const Schedule = () => {
                                   <div className="mt-2">
                                     <img
                                       src={update.image_url
-                                        ? `${process.env.REACT_APP_API_URL}${update.image_url}`
+                                        ? `${process.env.REACT_APP_API_URL}${update.image_thumb_url || update.image_url}`
                                         : `data:image/jpeg;base64,${update.image_data}`}
                                       alt="Update attachment"
                                       className="max-h-40 rounded border border-slate-200 cursor-pointer hover:opacity-90"
                                       onClick={() => setPreviewImage(
                                         update.image_url
-                                          ? `${process.env.REACT_APP_API_URL}${update.image_url}`
+                                          ? `${process.env.REACT_APP_API_URL}${update.image_web_url || update.image_url}`
                                           : `data:image/jpeg;base64,${update.image_data}`
                                       )}
                                     />
@@ -1237,6 +1260,11 @@ const Schedule = () => {
                             </div>
                           </div>
                         ))}
+                        {activityData.progress_updates_next_cursor && (
+                          <Button variant="outline" size="sm" className="w-full" onClick={handleLoadMoreUpdates}>
+                            Load more updates
+                          </Button>
+                        )}
                       </div>
                     </div>
                   )}
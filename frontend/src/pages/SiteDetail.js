@@ -40,8 +40,14 @@ const SiteDetail = () => {
       setTickets(siteTickets);
 
       // Fetch reports for this site
-      const reportsResponse = await axios.get(`${API}/reports?site_id=${siteId}`);
-      setReports(reportsResponse.data);
+      const siteReports = [];
+      let cursor = null;
+      do {
+        const reportsResponse = await axios.get(`${API}/reports`, { params: { site_id: siteId, cursor } });
+        siteReports.push(...reportsResponse.data.items);
+        cursor = reportsResponse.data.next_cursor;
+      } while (cursor);
+      setReports(siteReports);
 
       setLoading(false);
     } catch (error) {
@@ -227,7 +233,9 @@ const SiteDetail = () => {
                     </CardDescription>
                   </CardHeader>
                   <CardContent className="space-y-2">
-                    <p className="text-sm text-slate-300 line-clamp-2">{report.description}</p>
+                    <p className="text-xs text-slate-400">
+                      {report.comment_count || 0} comment{report.comment_count === 1 ? '' : 's'}
+                    </p>
                     <div className="flex items-center justify-between">
                       <span className="text-xs text-slate-500">
                         {moment(report.created_at).fromNow()}
@@ -123,6 +123,21 @@ const TicketDetail = () => {
     }
   };
 
+  const handleLoadEarlierComments = async () => {
+    try {
+      const response = await axios.get(`${API}/tickets/${ticketId}/comments`, {
+        params: { cursor: ticket.comments_next_cursor }
+      });
+      setTicket((prev) => ({
+        ...prev,
+        comments: [...response.data.items, ...prev.comments],
+        comments_next_cursor: response.data.next_cursor
+      }));
+    } catch (error) {
+      toast.error('Failed to load earlier comments');
+    }
+  };
+
   const handleUserSelect = (userId) => {
     const selectedUser = users.find(u => u.id === userId);
     if (selectedUser) {
@@ -346,6 +361,11 @@ const TicketDetail = () => {
             <CardContent className="space-y-4">
               {ticket.comments && ticket.comments.length > 0 ? (
                 <div className="space-y-3">
+                  {ticket.comments_next_cursor && (
+                    <Button type="button" variant="outline" size="sm" className="w-full" onClick={handleLoadEarlierComments}>
+                      Load earlier comments
+                    </Button>
+                  )}
                   {ticket.comments.map((c) => (
                     <div key={c.id} className="p-4 bg-gray-800/50 rounded-lg border border-gray-700">
                       <div className="flex items-center justify-between mb-2">
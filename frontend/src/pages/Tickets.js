@@ -428,9 +428,9 @@ const Tickets = () => {
                   </Badge>
                 </div>
 
-                {ticket.comments && ticket.comments.length > 0 && (
+                {ticket.comment_count > 0 && (
                   <p className="text-xs text-gray-500">
-                    {ticket.comments.length} comment{ticket.comments.length !== 1 ? 's' : ''}
+                    {ticket.comment_count} comment{ticket.comment_count !== 1 ? 's' : ''}
                   </p>
                 )}
               </CardContent>